@@ -0,0 +1,444 @@
+"""Fetch and analyze a page once so every tab can render from the result."""
+import contextvars
+import dataclasses
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, urlunsplit
+
+from extract import PageFacts, get_backend
+from metrics import stage, trace
+
+# Characters of source, text and code kept across the memoized pages (a page
+# stored under both its exact and normalized hash counts twice)
+MAX_MEMOIZED_CHARS = 64 * 1024 * 1024
+
+# exact or normalized hash -> ((normalized_hash, html_code, facts, top_bi_grams, tech_sizes), chars)
+_artifacts = OrderedDict()
+_artifacts_lock = threading.Lock()
+_memoized_chars = 0
+memo_stats = {'exact': 0, 'normalized': 0, 'misses': 0}
+
+# (mode, canonical URL, include_assets) -> _Flight of the analysis running for it
+_flights = {}
+_flights_lock = threading.Lock()
+# Requests that waited for an identical analysis already in flight instead of running their own
+flight_stats = {'coalesced': 0}
+
+
+def normalize_url(url):
+    """Return the canonical form of a user supplied domain or URL."""
+    url = url.strip()
+    if not re.match(r"^https?://", url, re.IGNORECASE):
+        url = "https://" + url
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+@dataclass
+class AnalysisResult:
+    url: str
+    domain_name: str
+    # Page source as fetched; None when it was streamed or reopened from history.
+    # The indented view is made on demand (see prettify.py), never by the analysis.
+    html_code: str
+    facts: PageFacts
+    # Sizes of the HTML, CSS and JavaScript code in characters, or in bytes
+    # when the external files were fetched too (see ``assets``)
+    tech_sizes: tuple = (0, 0, 0)
+    about_us_content: str = None
+    top_bi_grams: list = field(default_factory=list)
+    top_links: list = field(default_factory=list)
+    # Every distinct link target (``links.Link``), resolved against the page URL
+    link_index: list = field(default_factory=list)
+    fetched_at: float = field(default_factory=time.time)
+    # External CSS/JS files (``assets.Asset``), when they were fetched
+    assets: list = None
+    # SHA-256 of the fetched body, and of the body without volatile parts (see fingerprint.py)
+    content_hash: str = None
+    normalized_hash: str = None
+    # True when the artifacts were reused from an earlier analysis of the same content
+    unchanged: bool = False
+    # True when this is a copy of an identical analysis another caller had in flight;
+    # that caller stores the result, so this copy should not be saved again
+    coalesced: bool = False
+    # metrics.StageTiming of every stage that produced this result
+    timings: list = field(default_factory=list)
+
+    @property
+    def header_counts(self):
+        return self.facts.header_counts
+
+    @property
+    def css_code(self):
+        return self.facts.css_code
+
+    @property
+    def js_code(self):
+        return self.facts.js_code
+
+    def to_dict(self):
+        """JSON-serializable summary (without the page source)."""
+        return {
+            'url': self.url,
+            'domain_name': self.domain_name,
+            'fetched_at': self.fetched_at,
+            'header_counts': self.header_counts,
+            'links': self.facts.links,
+            'meta_description': self.facts.meta_description,
+            'about_us_content': self.about_us_content,
+            'tech_sizes': dict(zip(['html', 'css', 'js'], self.tech_sizes)),
+            'tech_percentages': dict(zip(['html', 'css', 'js'], self.tech_percentages)),
+            'content_hash': self.content_hash,
+            'normalized_hash': self.normalized_hash,
+            'top_bi_grams': [[list(gram), count] for gram, count in self.top_bi_grams],
+            'top_links': self.top_links,
+            'link_index': [link.to_dict() for link in self.link_index],
+            'timings': [timing.__dict__ for timing in self.timings],
+            'assets': None if self.assets is None else [
+                {'url': a.url, 'kind': a.kind, 'size': a.size, 'sha256': a.digest, 'error': a.error}
+                for a in self.assets
+            ],
+        }
+
+    @property
+    def tech_percentages(self):
+        # Percentage of each technology, in HTML, CSS, JavaScript order
+        total_length = sum(self.tech_sizes) or 1
+        return [size / total_length * 100 for size in self.tech_sizes]
+
+
+def first_sentence(text):
+    # Limit meta description to one sentence
+    sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?)\s', text)
+    return sentences[0]
+
+
+class _Flight:
+    """One analysis in progress: its future result and the latest progress it published."""
+
+    def __init__(self):
+        self.future = Future()
+        self.changed = threading.Condition()
+        self.progress = None
+        self.version = 0
+
+    def publish(self, partial):
+        with self.changed:
+            self.progress = partial
+            self.version += 1
+            self.changed.notify_all()
+
+    def run(self, key, work):
+        try:
+            self.future.set_result(work(self.publish))
+        except Exception as exc:
+            self.future.set_exception(exc)
+        except BaseException:
+            # Not shared (nor re-raised: this thread has no caller): every caller runs its own analysis instead
+            self.future.set_result(_ABORTED)
+        finally:
+            with _flights_lock:
+                del _flights[key]
+            with self.changed:
+                self.changed.notify_all()
+
+    def wait(self, on_progress):
+        """The result, passing each published progress to ``on_progress`` in the calling thread."""
+        if on_progress is None:
+            return self.future.result()
+        seen = 0
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: self.version != seen or self.future.done())
+                partial, seen = self.progress, self.version
+            if self.future.done():
+                return self.future.result()
+            on_progress(partial)
+
+
+# Result of a flight whose work was interrupted by a BaseException
+_ABORTED = object()
+
+
+def _single_flight(key, work, on_progress=None):
+    """Run ``work(publish)`` once for concurrent calls with the same ``key``; the others share its result.
+
+    The work runs in a thread of its own, so nothing specific to one caller
+    runs inside it: ``publish(partial)`` hands progress to every caller, whose
+    ``on_progress`` runs in the caller's thread. An exception raised there
+    (e.g. Streamlit stopping a session) only ends that caller's wait. Callers
+    that joined a flight get a copy of the result marked ``coalesced``, with
+    their own (waiting) timings and their own ``Link`` objects. Only
+    ``Exception``s are shared; if the work ends with any other
+    ``BaseException``, each caller runs the work itself.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+        else:
+            flight_stats['coalesced'] += 1
+    if leader:
+        threading.Thread(target=contextvars.copy_context().run, args=(flight.run, key, work),
+                         name='secode-analysis', daemon=True).start()
+        result = flight.wait(on_progress)
+    else:
+        with trace() as timings:
+            with stage('single_flight') as record:
+                record.cache = 'hit'
+                result = flight.wait(on_progress)
+    if result is _ABORTED:
+        return work(on_progress)
+    if leader or result is None:
+        return result
+    return dataclasses.replace(result, timings=timings, coalesced=True,
+                               link_index=[dataclasses.replace(link) for link in result.link_index])
+
+
+def _flight_key(mode, url, include_assets):
+    from crawl import canonicalize
+
+    try:
+        canonical = canonicalize(url)
+    except ValueError:
+        # e.g. a port out of range: the fetch reports it, the key is just the URL as given
+        canonical = None
+    return mode, canonical or url, include_assets
+
+
+def analyze(url, include_assets=False):
+    """Fetch ``url`` and compute everything the Technology and Analysis tabs show.
+
+    With ``include_assets`` the linked stylesheets and scripts are fetched
+    too and the HTML/CSS/JS weights are measured in bytes. Returns ``None``
+    when the page could not be fetched. Concurrent calls for the same page
+    (e.g. many sessions clicking Analyze on a shared link) fetch and
+    analyze it once.
+    """
+    url = normalize_url(url)
+    return _single_flight(_flight_key('page', url, include_assets), lambda publish: _analyze(url, include_assets))
+
+
+def _analyze(url, include_assets):
+    import requests
+    from page_cache import page_cache
+
+    with trace() as timings:
+        try:
+            page = page_cache.fetch(url)
+        except requests.RequestException:
+            return None
+        if page.status_code != 200:
+            return None
+
+        result = analyze_page(url, page.body, page.encoding)
+        if include_assets:
+            add_assets(result, len(page.body))
+    result.timings = timings
+    return result
+
+
+def _memo_get(key, stat):
+    with _artifacts_lock:
+        entry = _artifacts.get(key)
+        if entry is None:
+            return None
+        _artifacts.move_to_end(key)
+        memo_stats[stat] += 1
+        return entry[0]
+
+
+def _memo_put(keys, artifacts, stat=None):
+    global _memoized_chars
+
+    _, html_code, facts, _, _ = artifacts
+    size = len(html_code) + len(facts.text) + len(facts.css_code) + len(facts.js_code)
+    with _artifacts_lock:
+        if stat:
+            memo_stats[stat] += 1
+        for key in keys:
+            previous = _artifacts.pop(key, None)
+            if previous is not None:
+                _memoized_chars -= previous[1]
+            _artifacts[key] = (artifacts, size)
+            _memoized_chars += size
+        while _memoized_chars > MAX_MEMOIZED_CHARS and len(_artifacts) > len(keys):
+            _, (_, evicted) = _artifacts.popitem(last=False)
+            _memoized_chars -= evicted
+
+
+def analyze_page(url, body, encoding=None):
+    """Like ``analyze_html`` but reuses the parse, facts and n-grams of identical content.
+
+    ``body`` is the raw response body, in ``encoding``. A page is looked up by its exact
+    hash first and by its normalized hash second, so a page that only
+    differs in comments, nonces or CSRF tokens is not parsed again; its facts
+    are the same, and its source is this response's. (The chart PNG is
+    memoized by ``charts`` on the same derived values.)
+    """
+    from charset import decode
+    from fingerprint import exact_hash, normalized_hash
+
+    with stage('fingerprint') as record:
+        record.bytes = len(body)
+        content_hash = exact_hash(body)
+        normalized = None
+        artifacts = _memo_get(content_hash, 'exact')
+        if artifacts is None:
+            # Only normalize when the exact hash is unknown
+            normalized = normalized_hash(body)
+            artifacts = _memo_get(normalized, 'normalized')
+            if artifacts is not None:
+                _, _, facts, top_bi_grams, (_, css_size, js_size) = artifacts
+                html_code = decode(body, encoding) if isinstance(body, bytes) else body
+                tech_sizes = (max(len(html_code) - css_size - js_size, 0), css_size, js_size)
+                artifacts = (normalized, html_code, facts, top_bi_grams, tech_sizes)
+                _memo_put([content_hash], artifacts)
+        record.cache = 'miss' if artifacts is None else 'hit'
+
+    if artifacts is None:
+        result = analyze_html(url, body, encoding)
+        result.normalized_hash = normalized
+        artifacts = (normalized, result.html_code, result.facts, result.top_bi_grams, result.tech_sizes)
+        _memo_put([content_hash, normalized], artifacts, 'misses')
+    else:
+        normalized, html_code, facts, top_bi_grams, tech_sizes = artifacts
+        result = build_result(url, html_code, facts, top_bi_grams, tech_sizes)
+        result.normalized_hash = normalized
+        result.unchanged = True
+    result.content_hash = content_hash
+    return result
+
+
+def analyze_html(url, html, encoding=None):
+    """Compute the ``AnalysisResult`` for already fetched ``html`` (no network).
+
+    ``html`` is text, or the raw body in ``encoding``, which the parser reads
+    directly (see extract.py); the text is decoded only to be kept as
+    ``html_code``.
+    """
+    # Parse once; every fact below comes from a single walk of this tree
+    backend = get_backend()
+    with stage('parse') as record:
+        record.bytes = len(html)
+        tree = backend.parse(html, encoding)
+    if isinstance(html, bytes):
+        from charset import decode
+
+        with stage('decode') as record:
+            record.bytes = len(html)
+            html = decode(html, encoding)
+    with stage('extract'):
+        facts = backend.collect_facts(tree)
+    del tree
+
+    # Extract bi-grams
+    from ngrams import top_ngrams
+    with stage('bigrams') as record:
+        record.bytes = len(facts.text)
+        top_bi_grams = top_ngrams(facts.text, n=2, k=10)
+
+    # Inline <style>/<script> code counts as CSS/JS, as in streaming.py and assets.tech_bytes
+    css_size, js_size = len(facts.css_code), len(facts.js_code)
+    tech_sizes = (max(len(html) - css_size - js_size, 0), css_size, js_size)
+    return build_result(url, html, facts, top_bi_grams, tech_sizes)
+
+
+def add_assets(result, html_bytes):
+    """Fetch the external CSS/JS of ``result`` and recompute its ``tech_sizes`` in bytes."""
+    from assets import fetch_assets, tech_bytes
+
+    with stage('assets') as record:
+        result.assets = fetch_assets(result.url, result.facts)
+        record.bytes = sum(asset.size for asset in result.assets)
+        record.cache = 'hit' if result.assets and all(asset.reused for asset in result.assets) else 'miss'
+    result.tech_sizes = tech_bytes(html_bytes, result.facts, result.assets)
+
+
+def analyze_streaming(url, on_progress=None, include_assets=False):
+    """Like ``analyze`` but analyzes the page while it downloads, in constant memory.
+
+    ``on_progress`` receives ``streaming.PartialAnalysis`` snapshots. The page
+    source is not kept, so the result has no ``html_code``, CSS or JS text.
+    Callers that join an identical analysis in flight get its progress too.
+    """
+    url = normalize_url(url)
+    return _single_flight(_flight_key('stream', url, include_assets),
+                          lambda publish: _analyze_streaming(url, publish, include_assets), on_progress)
+
+
+def _analyze_streaming(url, on_progress, include_assets):
+    import requests
+    from streaming import analyze_stream
+
+    with trace() as timings:
+        try:
+            with stage('stream') as record:
+                partial, status_code = analyze_stream(url, on_progress)
+                record.bytes = partial.bytes_received if partial is not None else None
+        except requests.RequestException:
+            return None
+        if partial is None:
+            return None
+        result = _streamed_result(url, partial, include_assets)
+    result.timings = timings
+    return result
+
+
+def _streamed_result(url, partial, include_assets):
+    facts = PageFacts(
+        header_counts=partial.header_counts,
+        links=partial.links,
+        meta_description=partial.meta_description,
+        stylesheet_urls=partial.stylesheet_urls,
+        script_urls=partial.script_urls,
+        nofollow_links=partial.nofollow_links,
+        base_href=partial.base_href,
+    )
+    tech_sizes = (partial.html_size, partial.css_size, partial.js_size)
+    result = build_result(url, None, facts, partial.top_bi_grams, tech_sizes)
+    if include_assets:
+        from assets import fetch_assets
+
+        # The inline code sizes are only known in characters here
+        with stage('assets') as record:
+            result.assets = fetch_assets(url, facts)
+            record.bytes = sum(asset.size for asset in result.assets)
+        result.tech_sizes = (
+            partial.html_size,
+            partial.css_size + sum(asset.size for asset in result.assets if asset.kind == 'css'),
+            partial.js_size + sum(asset.size for asset in result.assets if asset.kind == 'js'),
+        )
+    return result
+
+
+def build_result(url, html_code, facts, top_bi_grams, tech_sizes):
+    # Extract domain name
+    match = re.search(r"https?://(?:www\.)?(.*?)\.", url)
+    domain_name = match.group(1) if match else urlsplit(url).hostname
+
+    # Resolve relative, protocol-relative and http links too
+    from links import build_link_index
+    link_index = build_link_index(url, facts)
+
+    about_us_content = facts.meta_description
+    if about_us_content:
+        about_us_content = first_sentence(about_us_content)
+
+    return AnalysisResult(
+        url=url,
+        domain_name=domain_name,
+        html_code=html_code,
+        facts=facts,
+        tech_sizes=tech_sizes,
+        about_us_content=about_us_content,
+        # Limit bi-grams and links to 10 and 7
+        top_bi_grams=top_bi_grams,
+        top_links=[link.url for link in link_index[:7]],
+        link_index=link_index,
+    )
@@ -0,0 +1,231 @@
+"""Optional crawl of a page's external CSS and JavaScript files.
+
+Linked stylesheets and scripts are fetched concurrently (a bounded number per
+page) and kept in a content-addressed store on disk: each body is saved once
+under its SHA-256, and a small URL index points at it. Shared files such as
+a CDN copy of jQuery are therefore downloaded once and reused by every page
+and every later analysis until ``ASSET_TTL`` expires. At most once per
+``PRUNE_INTERVAL`` a background thread deletes expired URL entries, the
+blobs no entry points at, and the oldest blobs beyond ``MAX_STORE_BYTES``.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urldefrag, urljoin
+
+CACHE_DIR = os.environ.get('SECODE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'secode'))
+# Reuse a stored file for this many seconds before fetching its URL again
+ASSET_TTL = 24 * 60 * 60
+MAX_ASSETS_PER_PAGE = 40
+MAX_ASSET_BYTES = 5 * 1024 * 1024
+ASSET_WORKERS = 8
+# Size of all stored blobs, and seconds between two automatic prunes
+MAX_STORE_BYTES = 256 * 1024 * 1024
+PRUNE_INTERVAL = 60 * 60
+# A blob this recent is kept without a URL entry: its entry may still be being written
+_PRUNE_GRACE = 60
+
+
+@dataclass
+class Asset:
+    url: str
+    kind: str  # 'css' or 'js'
+    size: int = 0
+    digest: str = None
+    error: str = None
+    reused: bool = False
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+        return 1
+    except OSError:
+        return 0
+
+
+class AssetStore:
+    """Content-addressed blobs plus a URL -> digest index, both on disk."""
+
+    def __init__(self, root=None, ttl=ASSET_TTL, max_bytes=MAX_STORE_BYTES):
+        self.root = root or os.path.join(CACHE_DIR, 'assets')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # URLs being fetched right now, so concurrent pages share one download
+        self._inflight = {}
+        self._pruned_at = None
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[:2], digest[2:])
+
+    def _url_path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, 'urls', key[:2], key[2:])
+
+    def lookup(self, url):
+        """Return ``(digest, size)`` for a fresh stored copy of ``url``, else ``None``."""
+        path = self._url_path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding='ascii') as handle:
+                digest = handle.read().strip()
+            return digest, os.path.getsize(self.blob_path(digest))
+        except OSError:
+            return None
+
+    def put(self, url, body):
+        digest = hashlib.sha256(body).hexdigest()
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            _write_atomic(blob, body)
+        _write_atomic(self._url_path(url), digest.encode('ascii'))
+        self._prune_if_due()
+        return digest
+
+    def _files(self, kind):
+        """``(path, stat)`` of every file under ``blobs`` or ``urls``."""
+        for directory, _, names in os.walk(os.path.join(self.root, kind)):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    pass
+
+    def prune(self):
+        """Delete expired URL entries, unreferenced blobs, then the oldest blobs over ``max_bytes``.
+
+        Returns the number of files deleted.
+        """
+        now = time.time()
+        deleted = 0
+        referenced = set()
+        for path, info in self._files('urls'):
+            if now - info.st_mtime > self.ttl:
+                deleted += _remove(path)
+                continue
+            try:
+                with open(path, encoding='ascii') as handle:
+                    referenced.add(handle.read().strip())
+            except (OSError, UnicodeDecodeError):
+                pass
+        blobs = []
+        for path, info in self._files('blobs'):
+            digest = os.path.basename(os.path.dirname(path)) + os.path.basename(path)
+            if digest not in referenced and now - info.st_mtime > _PRUNE_GRACE:
+                deleted += _remove(path)
+            else:
+                blobs.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in blobs)
+        # Oldest first; a URL entry left without its blob is a miss and downloads the file again
+        for _, size, path in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            deleted += _remove(path)
+            total -= size
+        return deleted
+
+    def _prune_if_due(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._pruned_at is not None and now - self._pruned_at < PRUNE_INTERVAL:
+                return
+            self._pruned_at = now
+        threading.Thread(target=self.prune, name='secode-asset-prune', daemon=True).start()
+
+    def read(self, digest):
+        with open(self.blob_path(digest), 'rb') as handle:
+            return handle.read()
+
+    def fetch(self, url, kind):
+        """Return an ``Asset`` for ``url``, downloading it only if no fresh copy is stored."""
+        import requests
+
+        import fetch_engine
+
+        stored = self.lookup(url)
+        if stored is not None:
+            return Asset(url, kind, size=stored[1], digest=stored[0], reused=True)
+
+        with self._lock:
+            event = self._inflight.get(url)
+            owner = event is None
+            if owner:
+                event = self._inflight[url] = threading.Event()
+        if not owner:
+            event.wait()
+            stored = self.lookup(url)
+            if stored is not None:
+                return Asset(url, kind, size=stored[1], digest=stored[0], reused=True)
+            return Asset(url, kind, error="Download failed")
+
+        try:
+            response = fetch_engine.fetch(url, max_bytes=MAX_ASSET_BYTES)
+            if response.status_code != 200:
+                return Asset(url, kind, error=f"HTTP {response.status_code}")
+            digest = self.put(url, response.content)
+            return Asset(url, kind, size=len(response.content), digest=digest)
+        except requests.RequestException as exc:
+            return Asset(url, kind, error=str(exc))
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+            event.set()
+
+
+asset_store = AssetStore()
+
+
+def asset_urls(base_url, facts, limit=MAX_ASSETS_PER_PAGE):
+    """Resolve a page's stylesheet and script URLs; returns ``[(url, kind), ...]`` without duplicates."""
+    base = urljoin(base_url, facts.base_href) if facts.base_href else base_url
+    found = []
+    seen = set()
+    for kind, hrefs in (('css', facts.stylesheet_urls), ('js', facts.script_urls)):
+        for href in hrefs:
+            url = urldefrag(urljoin(base, href.strip())).url
+            if url.startswith(('http://', 'https://')) and url not in seen:
+                seen.add(url)
+                found.append((url, kind))
+    return found[:limit]
+
+
+def fetch_assets(base_url, facts, store=None, workers=ASSET_WORKERS, limit=MAX_ASSETS_PER_PAGE):
+    """Fetch the external CSS/JS of one page concurrently and return its ``Asset`` list."""
+    store = store or asset_store
+    urls = asset_urls(base_url, facts, limit)
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as pool:
+        return list(pool.map(lambda item: store.fetch(*item), urls))
+
+
+def tech_bytes(html_bytes, facts, assets):
+    """HTML, CSS and JavaScript weights in bytes: inline code plus downloaded files.
+
+    The inline ``<style>``/``<script>`` code is counted as CSS/JS, not HTML.
+    """
+    inline_css = len(facts.css_code.encode('utf-8'))
+    inline_js = len(facts.js_code.encode('utf-8'))
+    css = inline_css + sum(asset.size for asset in assets if asset.kind == 'css')
+    js = inline_js + sum(asset.size for asset in assets if asset.kind == 'js')
+    return max(html_bytes - inline_css - inline_js, 0), css, js
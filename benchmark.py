@@ -0,0 +1,337 @@
+"""Benchmark every stage of the analysis pipeline on pages from 10 KB to 10 MB.
+
+Run ``python benchmark.py``. Each fixture is served by a local HTTP server, so
+the fetch stage measures the real client code without depending on the
+network. The stages are:
+
+- fetch (through the shared fetch engine, as the app does)
+- charset (resolve the encoding of the page with its charset declaration
+  removed, then decode it)
+- charset_guess (the same with ``requests``' fallback: a detector over the
+  whole body, as ``response.apparent_encoding`` does)
+- parse (from the bytes)
+- prettify (the on-demand indented view; not part of an analysis)
+- extract (headers, links, text)
+- bigrams
+- chart (``savefig``)
+
+For every fixture and stage the report shows throughput, p50/p95 latency
+and peak RSS growth.
+
+Fixtures are generated deterministically (``--seed``); ``.html`` files in
+``--fixtures DIR`` (saved real pages) are benchmarked as well.
+``--save FILE`` writes the results as a JSON baseline, and ``--compare FILE``
+checks a run against one and exits non-zero on a regression.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SIZES = {'10KB': 10 * 1024, '100KB': 100 * 1024, '1MB': 1024 * 1024, '10MB': 10 * 1024 * 1024}
+STAGES = ['fetch', 'charset', 'charset_guess', 'parse', 'prettify', 'extract', 'bigrams', 'chart']
+REPEAT = 5
+# A stage counts as regressed when its p50 is this much slower than the baseline,
+# and at least MIN_REGRESSION_MS slower (smaller differences are timer noise)
+REGRESSION = 0.20
+MIN_REGRESSION_MS = 1.0
+
+WORDS = """
+search engine optimization page content header link title description keyword ranking site domain
+mobile speed index crawl sitemap canonical structured data schema image alt text performance user
+experience website traffic organic result query meta tag anchor internal external backlink authority
+café résumé größe поиск 検索 – “quoted”
+""".split()
+
+
+def generate_page(size, seed=0):
+    """A deterministic page of about ``size`` bytes, shaped like a typical content site."""
+    rng = random.Random(seed)
+
+    def sentence(low=6, high=18):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+        return " ".join(words).capitalize() + "."
+
+    head = [
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">',
+        f'<title>{sentence(3, 6)}</title>',
+        f'<meta name="description" content="{sentence()} {sentence()}">',
+        '<link rel="stylesheet" href="/static/site.css"><script src="/static/app.js" defer></script>',
+        '<style>' + "".join(f".c{i}{{margin:{i}px;padding:{i % 7}px;color:#{i * 997 % 4096:03x}}}"
+                            for i in range(max(10, size // 2000))) + '</style>',
+        '</head><body><nav><ul>',
+        "".join(f'<li><a href="/section/{i}">{rng.choice(WORDS)}</a></li>' for i in range(12)),
+        '</ul></nav><main>',
+    ]
+    parts = head
+    length = sum(len(part) for part in parts)
+    article = 0
+    while length < size - 200:
+        article += 1
+        block = [f'<article id="a{article}"><h2>{sentence(3, 8)}</h2>']
+        for _ in range(rng.randint(2, 5)):
+            block.append(f'<h3>{sentence(2, 6)}</h3>')
+            for _ in range(rng.randint(1, 4)):
+                links = "".join(
+                    f' <a href="{rng.choice(["/", "https://example.org/", "../", "?p="])}{rng.randint(1, 500)}"'
+                    f'{" rel=nofollow" if rng.random() < 0.1 else ""}>{rng.choice(WORDS)}</a>'
+                    for _ in range(rng.randint(0, 3))
+                )
+                block.append(f'<p class="c{rng.randint(0, 9)}">{sentence()} {sentence()}{links}</p>')
+        if article % 5 == 0:
+            block.append('<script>window.dataLayer=window.dataLayer||[];dataLayer.push({"article":%d,"ts":%d});'
+                         '</script>' % (article, 1700000000 + article))
+        block.append('</article>')
+        chunk = "".join(block)
+        parts.append(chunk)
+        length += len(chunk)
+    parts.append('</main><footer><p>' + sentence() + '</p></footer></body></html>')
+    return "".join(parts).encode('utf-8')
+
+
+def without_charset(body):
+    """``body`` with the ``<meta>`` charset declarations in its head removed."""
+    from charset import META_SCAN_BYTES
+
+    head = re.sub(rb'<meta[^>]*charset[^>]*>', b'', body[:META_SCAN_BYTES], flags=re.IGNORECASE)
+    return head + body[META_SCAN_BYTES:]
+
+
+class _FixtureServer:
+    """Serves ``{path: body}`` from memory on a free localhost port."""
+
+    def __init__(self, pages):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = pages.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _rss():
+    """Resident set size of this process in bytes (``None`` where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _PeakRss:
+    """Samples the RSS in a background thread while the ``with`` block runs."""
+
+    def __enter__(self):
+        self.start = _rss()
+        self.peak = self.start
+        self._stop = threading.Event()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.002):
+            self.peak = max(self.peak, _rss())
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self.start is not None:
+            self._thread.join()
+            self.peak = max(self.peak, _rss())
+
+    @property
+    def growth(self):
+        return None if self.start is None else self.peak - self.start
+
+
+def _measure(run, repeat):
+    """Run ``run()`` ``repeat`` times; returns (timings in seconds, peak RSS growth, last return value)."""
+    timings = []
+    peak = None
+    value = None
+    for _ in range(repeat):
+        with _PeakRss() as rss:
+            started = time.perf_counter()
+            value = run()
+            timings.append(time.perf_counter() - started)
+        if rss.growth is not None:
+            peak = max(peak or 0, rss.growth)
+    return timings, peak, value
+
+
+def _summary(timings, size, peak):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    p50 = statistics.median(ordered)
+    return {
+        'p50_ms': round(p50 * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'throughput_mb_s': round(size / 1024 / 1024 / p50, 2) if p50 and size else None,
+        'peak_rss_mb': None if peak is None else round(peak / 1024 / 1024, 1),
+        'runs': len(timings),
+    }
+
+
+def run_benchmarks(fixtures, repeat=REPEAT, parser=None, stages=STAGES):
+    """Benchmark ``stages`` on ``{name: html_bytes}``; returns ``{name: {stage: summary}}``."""
+    import fetch_engine
+    from analysis import analyze_html
+    from charset import decode, resolve_encoding
+    from charts import chart_inputs, render_png
+    from extract import get_backend
+    from ngrams import top_ngrams
+    from prettify import pretty_lines
+
+    backend = get_backend(parser)
+    results = {}
+    with _FixtureServer({f'/{name}': body for name, body in fixtures.items()}) as base_url:
+        for name, body in fixtures.items():
+            encoding = resolve_encoding(body)
+            html = decode(body, encoding)
+            size = len(body)
+            report = results[name] = {'bytes': size, 'parser': backend.name}
+
+            if 'fetch' in stages:
+                timings, peak, _ = _measure(lambda: fetch_engine.fetch(f"{base_url}/{name}", max_bytes=size + 1),
+                                            repeat)
+                report['fetch'] = _summary(timings, size, peak)
+            if 'charset' in stages or 'charset_guess' in stages:
+                undeclared = without_charset(body)
+            if 'charset' in stages:
+                timings, peak, _ = _measure(lambda: decode(undeclared, resolve_encoding(undeclared, 'text/html')),
+                                            repeat)
+                report['charset'] = _summary(timings, size, peak)
+            if 'charset_guess' in stages:
+                from charset_normalizer import from_bytes
+
+                timings, peak, _ = _measure(
+                    lambda: undeclared.decode(from_bytes(undeclared).best().encoding, errors='replace'), repeat)
+                report['charset_guess'] = _summary(timings, size, peak)
+            tree = None
+            if set(stages) & {'parse', 'extract', 'bigrams'}:
+                timings, peak, tree = _measure(lambda: backend.parse(body, encoding), repeat)
+                if 'parse' in stages:
+                    report['parse'] = _summary(timings, size, peak)
+            if 'prettify' in stages:
+                timings, peak, _ = _measure(lambda: sum(1 for _ in pretty_lines(html)), repeat)
+                report['prettify'] = _summary(timings, size, peak)
+            facts = None
+            if set(stages) & {'extract', 'bigrams'}:
+                timings, peak, facts = _measure(lambda: backend.collect_facts(tree), repeat)
+                if 'extract' in stages:
+                    report['extract'] = _summary(timings, size, peak)
+            if 'bigrams' in stages:
+                timings, peak, _ = _measure(lambda: top_ngrams(facts.text, n=2, k=10), repeat)
+                report['bigrams'] = _summary(timings, len(facts.text.encode('utf-8')), peak)
+            if 'chart' in stages:
+                inputs = chart_inputs(analyze_html(f"https://{name}.example/", html))
+                timings, peak, _ = _measure(lambda: render_png(inputs), repeat)
+                # The figure does not grow with the page, so no throughput
+                report['chart'] = _summary(timings, 0, peak)
+            tree = facts = None
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION):
+    """Return ``[(fixture, stage, baseline_ms, current_ms), ...]`` for stages slower than ``threshold``."""
+    regressions = []
+    for name, stages in results.items():
+        for stage, summary in stages.items():
+            before = baseline.get('results', {}).get(name, {}).get(stage)
+            if not isinstance(summary, dict) or not isinstance(before, dict):
+                continue
+            slower = summary['p50_ms'] - before['p50_ms']
+            if slower > before['p50_ms'] * threshold and slower >= MIN_REGRESSION_MS:
+                regressions.append((name, stage, before['p50_ms'], summary['p50_ms']))
+    return regressions
+
+
+def load_fixtures(args):
+    sizes = args.sizes.split(',') if args.sizes else list(SIZES)
+    fixtures = {f'generated-{label}.html': generate_page(SIZES[label], args.seed) for label in sizes}
+    if args.fixtures:
+        for filename in sorted(os.listdir(args.fixtures)):
+            if filename.endswith(('.html', '.htm')):
+                with open(os.path.join(args.fixtures, filename), 'rb') as handle:
+                    fixtures[filename] = handle.read()
+    return fixtures
+
+
+def print_table(results):
+    print(f"{'fixture':<26}{'stage':<15}{'p50 ms':>10}{'p95 ms':>10}{'MB/s':>9}{'peak RSS MB':>13}")
+    for name, stages in results.items():
+        for stage in STAGES:
+            summary = stages.get(stage)
+            if summary is None:
+                continue
+            peak = '-' if summary['peak_rss_mb'] is None else summary['peak_rss_mb']
+            throughput = '-' if summary['throughput_mb_s'] is None else f"{summary['throughput_mb_s']:.2f}"
+            print(f"{name:<26}{stage:<15}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+                  f"{throughput:>9}{peak:>13}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SEO analysis pipeline stage by stage.")
+    parser.add_argument('--sizes', metavar='LIST', help=f"generated fixture sizes (default {','.join(SIZES)})")
+    parser.add_argument('--fixtures', metavar='DIR', help="also benchmark the .html files in DIR")
+    parser.add_argument('--stages', metavar='LIST', help=f"stages to run (default {','.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=REPEAT, metavar='N', help="runs per stage")
+    parser.add_argument('--parser', metavar='BACKEND', help="parser backend (default: auto)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the generated fixtures")
+    parser.add_argument('--save', metavar='FILE', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='FILE', help="compare against a saved baseline")
+    args = parser.parse_args(argv)
+
+    stages = args.stages.split(',') if args.stages else STAGES
+    results = run_benchmarks(load_fixtures(args), repeat=max(1, args.repeat), parser=args.parser, stages=stages)
+    print_table(results)
+
+    if args.save:
+        document = {
+            'created_at': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }
+        with open(args.save, 'w', encoding='utf-8') as handle:
+            json.dump(document, handle, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            regressions = compare(results, json.load(handle))
+        for name, stage, before, after in regressions:
+            print(f"REGRESSION {name} {stage}: p50 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            return 1
+        print("OK: no stage regressed by more than {:.0%}".format(REGRESSION))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
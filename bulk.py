@@ -0,0 +1,167 @@
+"""Bulk analysis of many domains at once.
+
+Pages are fetched concurrently by a bounded thread pool (with a per-host
+limit so one site is never hit by many requests at the same time) through
+the shared connections of ``fetch_engine``, and the CPU-bound extraction
+runs in a process pool as each page arrives.
+"""
+import csv
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+
+from analysis import analyze_html, normalize_url
+from page_cache import page_cache
+
+FETCH_WORKERS = 16
+# At most this many requests in flight per host, spaced at least HOST_DELAY seconds apart
+PER_HOST = 2
+HOST_DELAY = 0.5
+HEADER_COLUMNS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def parse_domains(text):
+    """Return the normalized, de-duplicated URLs listed in ``text``.
+
+    Accepts one domain per line, comma separated values (the first column is
+    used) and ``#`` comments; a header row such as ``domain`` is skipped.
+    """
+    urls = []
+    seen = set()
+    for row in csv.reader(io.StringIO(text)):
+        if not row:
+            continue
+        value = row[0].strip()
+        if not value or value.startswith('#') or value.lower() in ('domain', 'domains', 'url', 'urls'):
+            continue
+        url = normalize_url(value)
+        if url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+
+class HostLimiter:
+    """Per-host politeness: bounded concurrency and a minimum gap between requests."""
+
+    def __init__(self, per_host=PER_HOST, delay=HOST_DELAY):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    def __call__(self, url):
+        return _HostSlot(self, urlsplit(url).hostname or url)
+
+    def wait_turn(self, host):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+
+class _HostSlot:
+    def __init__(self, limiter, host):
+        self.limiter = limiter
+        self.host = host
+        self.semaphore = limiter._semaphore(host)
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        self.limiter.wait_turn(self.host)
+
+    def __exit__(self, *exc_info):
+        self.semaphore.release()
+
+
+def get_process_pool():
+    """Process pool shared by every bulk run in this server process."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None or getattr(_process_pool, '_broken', False):
+            # spawn: forking a threaded Streamlit server is not safe
+            _process_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+
+def fetch_one(url, limiter):
+    with limiter(url):
+        return page_cache.fetch(url)
+
+
+def summarize(url, html):
+    """Analyze ``html`` and flatten the result into one table row (runs in a worker process)."""
+    result = analyze_html(url, html)
+    html_percent, css_percent, js_percent = result.tech_percentages
+    row = {'domain': urlsplit(url).hostname, 'url': url, 'status': 200, 'error': None}
+    for name in HEADER_COLUMNS:
+        row[name] = result.header_counts.get(name, 0)
+    row.update({
+        'links': len(result.facts.links),
+        'html_percent': round(html_percent, 1),
+        'css_percent': round(css_percent, 1),
+        'js_percent': round(js_percent, 1),
+        'top_bi_grams': "; ".join(f"{' '.join(gram)} ({count})" for gram, count in result.top_bi_grams),
+    })
+    return row
+
+
+def failed_row(url, status=None, error=None):
+    row = {'domain': urlsplit(url).hostname, 'url': url, 'status': status, 'error': error}
+    row.update({name: None for name in HEADER_COLUMNS})
+    return row
+
+
+def analyze_many(urls, on_progress=None, fetch_workers=FETCH_WORKERS, limiter=None, process_pool=None):
+    """Fetch and analyze every URL in ``urls`` and return one row dict per URL, in input order.
+
+    ``on_progress(done, total)`` is called each time a URL finishes.
+    """
+    limiter = limiter or HostLimiter()
+    process_pool = process_pool or get_process_pool()
+    rows = {}
+    analyses = {}
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers:
+        fetches = {fetchers.submit(fetch_one, url, limiter): url for url in urls}
+        for future in as_completed(fetches):
+            url = fetches[future]
+            try:
+                page = future.result()
+            except requests.RequestException as exc:
+                rows[url] = failed_row(url, error=str(exc))
+            else:
+                if page.status_code == 200:
+                    analyses[process_pool.submit(summarize, url, page.text)] = url
+                else:
+                    rows[url] = failed_row(url, status=page.status_code, error="HTTP error")
+            if url in rows and on_progress is not None:
+                on_progress(len(rows), len(urls))
+
+    for future in as_completed(analyses):
+        url = analyses[future]
+        try:
+            rows[url] = future.result()
+        except Exception as exc:
+            rows[url] = failed_row(url, status=200, error=f"Analysis failed: {exc}")
+        if on_progress is not None:
+            on_progress(len(rows), len(urls))
+
+    return [rows[url] for url in urls]
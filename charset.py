@@ -0,0 +1,120 @@
+"""Character encoding of a fetched page, resolved the way browsers do.
+
+The checks run in order and stop at the first answer:
+
+1. a byte order mark;
+2. the ``charset`` parameter of the HTTP ``Content-Type`` header;
+3. a ``<meta charset>`` (or ``http-equiv`` Content-Type) in the first
+   ``META_SCAN_BYTES`` of the body;
+4. a detector run on at most ``DETECT_SAMPLE_BYTES`` of the body: valid
+   UTF-8 wins, otherwise ``charset_normalizer`` guesses.
+
+``requests`` instead assumes ISO-8859-1 for any ``text/*`` response without
+a charset, and ``apparent_encoding`` runs its detector over the whole body,
+which takes seconds on a large page.
+"""
+import codecs
+import re
+
+META_SCAN_BYTES = 4096
+DETECT_SAMPLE_BYTES = 64 * 1024
+# What browsers fall back to for pages that are not UTF-8
+FALLBACK = 'cp1252'
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([^"\';\s]+)', re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([A-Za-z0-9._:-]+)', re.IGNORECASE)
+# Labels that the HTML standard maps to windows-1252
+_WINDOWS_1252_LABELS = frozenset(['ascii', 'iso8859_1', 'cp1252'])
+
+
+def _codec(label):
+    """Python codec name for an encoding label, or ``None`` when unknown."""
+    try:
+        name = codecs.lookup(label.strip()).name
+    except (LookupError, ValueError):
+        return None
+    return FALLBACK if name.replace('-', '_') in _WINDOWS_1252_LABELS else name
+
+
+def bom_encoding(body):
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return name
+    return None
+
+
+def header_encoding(content_type):
+    match = _HEADER_CHARSET.search(content_type or '')
+    return _codec(match.group(1)) if match else None
+
+
+def meta_encoding(body):
+    match = _META_CHARSET.search(body, 0, META_SCAN_BYTES)
+    if match is None:
+        return None
+    name = _codec(match.group(1).decode('ascii'))
+    # A page that can be read this far is not UTF-16, whatever it declares
+    if name is not None and name.startswith('utf-16'):
+        return 'utf-8'
+    return name
+
+
+def detect_encoding(body):
+    """Guess the encoding from at most ``DETECT_SAMPLE_BYTES`` of ``body``."""
+    sample = body[:DETECT_SAMPLE_BYTES]
+    try:
+        # A multi-byte sequence cut by the sample boundary is still valid UTF-8
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=len(sample) == len(body))
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return FALLBACK
+    best = from_bytes(sample).best()
+    return (_codec(best.encoding) if best is not None else None) or FALLBACK
+
+
+def resolve(body, content_type=None):
+    """Return ``(encoding, source)`` for ``body``; ``source`` is 'bom', 'header', 'meta' or 'detected'."""
+    name = bom_encoding(body)
+    if name is not None:
+        return name, 'bom'
+    name = header_encoding(content_type)
+    if name is not None:
+        return name, 'header'
+    name = meta_encoding(body)
+    if name is not None:
+        return name, 'meta'
+    return detect_encoding(body), 'detected'
+
+
+def resolve_encoding(body, content_type=None):
+    return resolve(body, content_type)[0]
+
+
+def is_utf8(encoding):
+    return encoding is not None and codecs.lookup(encoding).name == 'utf-8'
+
+
+def strip_bom(body, encoding):
+    """``body`` without the byte order mark of ``encoding``, if it starts with one."""
+    encoding = codecs.lookup(encoding).name
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return body[len(bom):] if name == encoding else body
+    return body
+
+
+def decode(body, encoding):
+    """``body`` as text; a byte order mark is dropped and undecodable bytes are replaced."""
+    encoding = encoding or 'utf-8'
+    return strip_bom(body, encoding).decode(encoding, errors='replace')
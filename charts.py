@@ -0,0 +1,125 @@
+"""Render the composite Analysis figure for an ``AnalysisResult``.
+
+Rendering uses the Agg canvas directly (no pyplot, so no global figure
+registry to leak into) and is memoized by a hash of the chart inputs, so
+reruns and the download button reuse the same PNG bytes.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+
+from metrics import stage
+
+# Number of rendered PNGs kept in memory
+MAX_CACHED_CHARTS = 64
+
+_png_cache = OrderedDict()
+_png_cache_lock = threading.Lock()
+
+
+def chart_inputs(result):
+    """Everything the figure depends on, as plain JSON-serializable values."""
+    return {
+        'url': result.url,
+        'domain_name': result.domain_name or "",
+        'about_us_content': result.about_us_content,
+        'header_counts': sorted(result.header_counts.items()),
+        'tech_percentages': [round(percent, 6) for percent in result.tech_percentages],
+        'top_bi_grams': [[list(gram), count] for gram, count in result.top_bi_grams],
+        'top_links': list(result.top_links),
+    }
+
+
+def chart_key(result):
+    """Content hash identifying the figure rendered for ``result``."""
+    payload = json.dumps(chart_inputs(result), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_analysis_png(result):
+    """Return the Analysis tab figure for ``result`` as PNG bytes (memoized)."""
+    with stage('chart') as record:
+        key = chart_key(result)
+        with _png_cache_lock:
+            png = _png_cache.get(key)
+            if png is not None:
+                _png_cache.move_to_end(key)
+        record.cache = 'miss' if png is None else 'hit'
+        if png is None:
+            png = render_png(chart_inputs(result))
+            with _png_cache_lock:
+                _png_cache[key] = png
+                while len(_png_cache) > MAX_CACHED_CHARTS:
+                    _png_cache.popitem(last=False)
+        record.bytes = len(png)
+        return png
+
+
+def render_png(inputs):
+    """Draw the figure described by ``chart_inputs()`` and return it as PNG bytes."""
+    # Imported here so chart_key() works without loading matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    header_counts = dict(inputs['header_counts'])
+    html_percent, css_percent, js_percent = inputs['tech_percentages']
+    top_bi_grams = [(tuple(gram), count) for gram, count in inputs['top_bi_grams']]
+    top_links = inputs['top_links']
+    about_us_content = inputs['about_us_content']
+
+    # Create a single image containing all the analysis results
+    fig = Figure(figsize=(12, 8))  # Adjust the figure size here
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(2, 2)
+    try:
+        # Header tags bar graph
+        if header_counts:
+            labels = list(header_counts.keys())
+            counts = list(header_counts.values())
+            axes[0, 0].bar(labels, counts, color='skyblue')
+            axes[0, 0].set_xlabel('Header Tags')
+            axes[0, 0].set_ylabel('Count')
+            axes[0, 0].tick_params(axis='x', labelrotation=45)
+            axes[0, 0].set_title('Header Tags Analysis')
+            axes[0, 0].margins(0.2)  # Add more margin to the graph
+
+        # Technology pie chart
+        labels = ['HTML', 'CSS', 'JavaScript']
+        sizes = [html_percent, css_percent, js_percent]
+        explode = (0.1, 0.1, 0.1)  # explode 1st slice
+        axes[0, 1].pie(sizes, explode=explode, labels=labels, autopct='%1.1f%%', shadow=True, startangle=140)
+        axes[0, 1].axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+        axes[0, 1].set_title('Technology Analysis')
+        axes[0, 1].margins(0.2)  # Add more margin to the graph
+
+        # Top bi-grams bar graph
+        bi_gram_labels = [str(gram) for gram, count in top_bi_grams]
+        bi_gram_counts = [count for gram, count in top_bi_grams]
+        axes[1, 0].barh(bi_gram_labels[::-1], bi_gram_counts[::-1], color='lightgreen')  # Reversed to display most common bi-grams at the top
+        axes[1, 0].set_xlabel('Count')
+        axes[1, 0].set_ylabel('Bi-gram')
+        axes[1, 0].set_title('Top Bi-grams')
+        axes[1, 0].margins(0.2)  # Add more margin to the graph
+
+        # Top links table
+        axes[1, 1].axis('off')  # Hide axes for the table
+        table_data = [["Top Links:"]] + [[link] for link in top_links]
+        table = axes[1, 1].table(cellText=table_data, loc='center', cellLoc='center', colWidths=[0.5]*5)
+        table.auto_set_font_size(False)
+        table.set_fontsize(8)
+        table.scale(2, 2.1)
+
+        # Add title and paragraph
+        fig.text(0.02, 0.98, f"SEO Analysis on {inputs['url']}", fontsize=14, fontweight='bold', color='black', ha ='left', va='top', backgroundcolor='white', alpha=0.5)
+        fig.text(0.02, 0.95, f"About {inputs['domain_name'].capitalize()}:\n{about_us_content if about_us_content else 'No meta description available.'}", fontsize=10, color='black', ha ='left', va='top', backgroundcolor='white', alpha=0.5)
+        fig.tight_layout(rect=[0, 0.03, 1, 0.95])  # Adjust the top padding
+
+        # Save the composite image
+        img_data = io.BytesIO()
+        fig.savefig(img_data, format='png')
+        return img_data.getvalue()
+    finally:
+        # Release the figure's artists right away instead of waiting for GC
+        fig.clear()
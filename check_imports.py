@@ -0,0 +1,66 @@
+"""Measure and enforce the import cost of the modules secode.py loads on every cold start.
+
+Run ``python check_imports.py``; it exits non-zero when the startup modules
+pull in a heavy dependency or take longer than ``BUDGET_MS`` to import.
+Streamlit itself is not counted. tests/test_imports.py runs the same check
+and fails when ``STARTUP_MODULES`` no longer lists every local module
+secode.py imports at the top level.
+"""
+import os
+import re
+import subprocess
+import sys
+
+# Modules secode.py imports at the top of the script
+STARTUP_MODULES = ['analysis', 'page_cache', 'store', 'monitor', 'metrics', 'code_pages']
+# Dependencies that must only be imported by the tab or stage that needs them
+DEFERRED = ['matplotlib', 'pandas', 'numpy', 'bs4', 'lxml', 'selectolax', 'requests', 'urllib3']
+BUDGET_MS = 150
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def measure(modules=STARTUP_MODULES):
+    """Return ``(total_ms, imported_module_names)`` for a fresh interpreter importing ``modules``."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = "import " + ", ".join(modules)
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=here, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    imported = set()
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        imported.add(name)
+        if name in modules and not indent:
+            total_us += int(cumulative)
+    return total_us / 1000, imported
+
+
+def leaked_dependencies(imported):
+    return sorted(name for name in imported if name.split('.')[0] in DEFERRED)
+
+
+def main():
+    total_ms, imported = measure()
+    leaked = leaked_dependencies(imported)
+    print(f"startup modules: {', '.join(STARTUP_MODULES)}")
+    print(f"import time: {total_ms:.1f} ms (budget {BUDGET_MS} ms)")
+    failed = False
+    if leaked:
+        print(f"FAIL: deferred dependencies imported at startup: {', '.join(leaked)}")
+        failed = True
+    if total_ms > BUDGET_MS:
+        print("FAIL: import time over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
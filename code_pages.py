@@ -0,0 +1,100 @@
+"""Line-addressed pages of a large text, for the Technology tab's code viewer.
+
+The text stays on the server; only the requested window of lines is sliced
+out and sent to the browser. An index of line start offsets is built once per
+text, so showing any page costs the same whatever the size of the text.
+``LinePages`` does the same for text that already comes as a list of lines,
+such as the prettified HTML.
+"""
+import re
+from array import array
+from bisect import bisect_right
+
+PAGE_SIZES = (100, 200, 500, 1000)
+MAX_SEARCH_HITS = 200
+# Characters sent per page, for minified sources whose few lines are very long
+MAX_PAGE_CHARS = 100_000
+
+_NEWLINE = re.compile('\n')
+
+
+class CodePages:
+    def __init__(self, text):
+        # What the pages were built from, to tell whether they are still current
+        self.source = self.text = text
+        # Offset of the first character of every line
+        self.starts = array('q', [0])
+        self.starts.extend(match.end() for match in _NEWLINE.finditer(text))
+        # End of the last line; a trailing newline does not start another line
+        self._end = len(text)
+        if len(self.starts) > 1 and self.starts[-1] == len(text):
+            self.starts.pop()
+            self._end -= 1
+        self._lowered = None
+
+    @property
+    def line_count(self):
+        return len(self.starts) if self.text else 0
+
+    def line_of(self, offset):
+        """1-based line number containing character ``offset``."""
+        return bisect_right(self.starts, offset)
+
+    def lines(self, first, count):
+        """Lines ``first`` (1-based) to ``first + count - 1`` as one string."""
+        first = max(1, min(first, self.line_count))
+        start = self.starts[first - 1] if self.line_count else 0
+        last = first - 1 + count
+        end = self.starts[last] - 1 if last < len(self.starts) else self._end
+        return self.text[start:end]
+
+    def search(self, query, limit=MAX_SEARCH_HITS, case_sensitive=False):
+        """Line numbers of the first ``limit`` lines containing ``query`` (each line once)."""
+        if not query:
+            return []
+        haystack = self.text
+        if not case_sensitive:
+            if self._lowered is None:
+                self._lowered = self.text.lower()
+            haystack, query = self._lowered, query.lower()
+        hits = []
+        offset = haystack.find(query)
+        while offset != -1 and len(hits) < limit:
+            line = self.line_of(offset)
+            hits.append(line)
+            # Continue after this line
+            next_start = self.starts[line] if line < len(self.starts) else len(haystack)
+            offset = haystack.find(query, next_start)
+        return hits
+
+
+class LinePages:
+    """``CodePages`` over a list of lines (without their newlines)."""
+
+    def __init__(self, lines):
+        self.source = self.line_list = lines
+        self._lowered = None
+
+    @property
+    def line_count(self):
+        return len(self.line_list)
+
+    def lines(self, first, count):
+        first = max(1, min(first, self.line_count))
+        return '\n'.join(self.line_list[first - 1:first - 1 + count])
+
+    def search(self, query, limit=MAX_SEARCH_HITS, case_sensitive=False):
+        if not query:
+            return []
+        lines = self.line_list
+        if not case_sensitive:
+            if self._lowered is None:
+                self._lowered = [line.lower() for line in lines]
+            lines, query = self._lowered, query.lower()
+        hits = []
+        for number, line in enumerate(lines, 1):
+            if query in line:
+                hits.append(number)
+                if len(hits) >= limit:
+                    break
+        return hits
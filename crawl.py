@@ -0,0 +1,334 @@
+"""Multi-page crawl of one site, with totals across all of its pages.
+
+Starting from a URL, same-site (same host and port) ``<a href>`` links are followed breadth-first
+from a frontier queue. URLs are canonicalized before the visited check.
+robots.txt is honoured, a bounded thread pool fetches and parses the pages,
+and the crawl stops at the page, depth or time budget, whichever comes
+first.
+
+Memory stays bounded however large the site is:
+
+- the visited set holds 8-byte URL hashes, not URLs;
+- the frontier is capped at ``MAX_FRONTIER`` entries;
+- bi-gram totals are kept for the ``MAX_TRACKED_NGRAMS`` most frequent
+  bi-grams only;
+- no page source is kept after it has been parsed.
+"""
+import hashlib
+import heapq
+import posixpath
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+CRAWL_WORKERS = 8
+MAX_PAGES = 200
+MAX_DEPTH = 3
+# Seconds
+TIME_BUDGET = 120
+MAX_FRONTIER = 10000
+MAX_TRACKED_NGRAMS = 20000
+# Bi-grams taken from each page for the site totals
+NGRAMS_PER_PAGE = 50
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+# Query parameters that never change the content of a page
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', '_ga')
+SKIPPED_EXTENSIONS = frozenset("""
+.7z .avi .bmp .css .csv .doc .docx .exe .gif .gz .ico .jpeg .jpg .js .json .m4a .mov .mp3 .mp4 .mpeg .ogg .pdf
+.png .ppt .pptx .rar .svg .tar .tgz .tif .tiff .txt .wav .webm .webp .woff .woff2 .xls .xlsx .xml .zip
+""".split())
+
+
+def canonicalize(url):
+    """Canonical form of an absolute http(s) URL, used for the visited check (``None`` for other schemes).
+
+    Lowercases the scheme and host, drops default ports, fragments and
+    tracking parameters, resolves ``.``/``..`` segments and sorts the query.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if _explicit_port(scheme, parts.port):
+        host = f"{host}:{parts.port}"
+    path = parts.path or '/'
+    if '.' in path:
+        trailing = path.endswith('/')
+        path = posixpath.normpath(path)
+        if trailing and path != '/':
+            path += '/'
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def _explicit_port(scheme, port):
+    return port and port != {'http': 80, 'https': 443}.get(scheme)
+
+
+def site_of(url):
+    """The site ``url`` belongs to: its host without ``www.``, and its port unless that is the default."""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    site = host[4:] if host.startswith('www.') else host
+    if _explicit_port(parts.scheme.lower(), parts.port):
+        site = f"{site}:{parts.port}"
+    return site
+
+
+class VisitedSet:
+    """Set of seen URLs stored as 64-bit hashes (about 70 bytes per URL instead of the URL itself)."""
+
+    def __init__(self):
+        self._hashes = set()
+
+    @staticmethod
+    def _key(url):
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def add(self, url):
+        """Record ``url``; returns ``False`` if it was already seen."""
+        key = self._key(url)
+        if key in self._hashes:
+            return False
+        self._hashes.add(key)
+        return True
+
+    def __contains__(self, url):
+        return self._key(url) in self._hashes
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+class RobotsRules:
+    """robots.txt rules per host, fetched once per crawl."""
+
+    def __init__(self, user_agent=None):
+        import http_client
+
+        self.user_agent = user_agent or http_client.USER_AGENT
+        self._parsers = {}
+        self._lock = threading.Lock()
+
+    def _parser(self, url):
+        from urllib.robotparser import RobotFileParser
+
+        import fetch_engine
+
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if origin in self._parsers:
+                return self._parsers[origin]
+        parser = RobotFileParser(origin + '/robots.txt')
+        try:
+            response = fetch_engine.fetch(origin + '/robots.txt', max_bytes=512 * 1024)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code == 200:
+                parser.parse(response.content.decode('utf-8', errors='replace').splitlines())
+            else:
+                parser.allow_all = True
+        except Exception:
+            # No readable robots.txt: everything is allowed
+            parser.allow_all = True
+        with self._lock:
+            return self._parsers.setdefault(origin, parser)
+
+    def allowed(self, url):
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        return self._parser(url).crawl_delay(self.user_agent) or 0
+
+
+@dataclass
+class PageSummary:
+    url: str
+    depth: int
+    status: int = None
+    error: str = None
+    headers: int = 0
+    links: int = 0
+
+
+@dataclass
+class CrawlReport:
+    start_url: str
+    pages: list = field(default_factory=list)
+    header_counts: Counter = field(default_factory=Counter)
+    top_bi_grams: list = field(default_factory=list)
+    # URLs seen but not crawled
+    skipped_robots: int = 0
+    skipped_budget: int = 0
+    # 'done', 'pages', 'time' or 'cancelled'
+    stopped_by: str = 'done'
+    elapsed: float = 0.0
+
+    @property
+    def pages_crawled(self):
+        return sum(1 for page in self.pages if page.status == 200)
+
+    def to_dict(self):
+        return {
+            'start_url': self.start_url,
+            'pages_crawled': self.pages_crawled,
+            'pages': [page.__dict__ for page in self.pages],
+            'header_counts': dict(self.header_counts),
+            'top_bi_grams': [[list(gram), count] for gram, count in self.top_bi_grams],
+            'skipped_robots': self.skipped_robots,
+            'skipped_budget': self.skipped_budget,
+            'stopped_by': self.stopped_by,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+
+class _NgramTotals:
+    """Site-wide bi-gram counts, pruned to the most frequent ``limit`` entries."""
+
+    def __init__(self, limit=MAX_TRACKED_NGRAMS):
+        self.limit = limit
+        self.counts = Counter()
+
+    def add(self, grams):
+        for gram, count in grams:
+            self.counts[gram] += count
+        if len(self.counts) > 2 * self.limit:
+            self.counts = Counter(dict(heapq.nlargest(self.limit, self.counts.items(), key=lambda item: item[1])))
+
+    def most_common(self, k):
+        return self.counts.most_common(k)
+
+
+def crawl_page(url, limiter):
+    """Fetch and analyze one page; returns ``(final_url, status, facts_or_None, error)``."""
+    import requests
+
+    import fetch_engine
+    from charset import resolve_encoding
+    from extract import get_backend
+
+    try:
+        with limiter(url):
+            response = fetch_engine.fetch(url, max_bytes=MAX_PAGE_BYTES)
+    except requests.RequestException as exc:
+        return url, None, None, str(exc)
+    if response.status_code != 200:
+        return response.url, response.status_code, None, "HTTP error"
+    content_type = response.headers.get('Content-Type', 'text/html')
+    if 'html' not in content_type.lower():
+        return response.url, response.status_code, None, f"Not HTML ({content_type.split(';')[0]})"
+    # The parser reads the bytes; the page is never decoded as a whole
+    encoding = resolve_encoding(response.content, content_type)
+    backend = get_backend()
+    return response.url, 200, backend.collect_facts(backend.parse(response.content, encoding)), None
+
+
+def _extend_frontier(frontier, visited, site, base_url, hrefs, depth):
+    """Queue the unseen same-site page links among ``hrefs``; returns how many did not fit.
+
+    A link is marked visited only once it is queued, so one dropped while the
+    frontier is full is queued again when another page links to it later.
+    """
+    dropped = 0
+    for href in hrefs:
+        link = canonicalize(urljoin(base_url, href))
+        if link is None or site_of(link) != site:
+            continue
+        if posixpath.splitext(urlsplit(link).path)[1].lower() in SKIPPED_EXTENSIONS:
+            continue
+        if link in visited:
+            continue
+        if len(frontier) >= MAX_FRONTIER:
+            dropped += 1
+            continue
+        visited.add(link)
+        frontier.append((link, depth))
+    return dropped
+
+
+def crawl(start_url, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, time_budget=TIME_BUDGET, workers=CRAWL_WORKERS,
+          respect_robots=True, on_progress=None, cancel=None):
+    """Crawl the site of ``start_url`` and return a ``CrawlReport``.
+
+    ``on_progress(report, frontier_size)`` is called after every page;
+    setting the ``cancel`` event stops the crawl early.
+    """
+    from analysis import normalize_url
+    from bulk import HostLimiter
+    from ngrams import top_ngrams
+
+    started = time.monotonic()
+    start_url = canonicalize(normalize_url(start_url))
+    site = site_of(start_url)
+    report = CrawlReport(start_url)
+    robots = RobotsRules() if respect_robots else None
+    delay = robots.crawl_delay(start_url) if robots else 0
+    # With a Crawl-delay the site gets one request at a time
+    limiter = HostLimiter(per_host=1 if delay else workers, delay=delay)
+    ngram_totals = _NgramTotals()
+
+    visited = VisitedSet()
+    visited.add(start_url)
+    frontier = deque([(start_url, 0)])
+    submitted = 0
+    running = {}
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='secode-crawl')
+    try:
+        while frontier or running:
+            if cancel is not None and cancel.is_set():
+                report.stopped_by = 'cancelled'
+                break
+            if time.monotonic() - started > time_budget:
+                report.stopped_by = 'time'
+                break
+
+            while frontier and len(running) < workers and submitted < max_pages:
+                url, depth = frontier.popleft()
+                if robots and not robots.allowed(url):
+                    report.skipped_robots += 1
+                    continue
+                running[pool.submit(crawl_page, url, limiter)] = (url, depth)
+                submitted += 1
+            if not running:
+                if frontier:
+                    report.stopped_by = 'pages'
+                break
+
+            remaining = time_budget - (time.monotonic() - started)
+            done, _ = wait(running, timeout=max(0.1, min(remaining, 1.0)), return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth = running.pop(future)
+                final_url, status, facts, error = future.result()
+                page = PageSummary(url, depth, status, error)
+                report.pages.append(page)
+                if facts is not None:
+                    page.headers = sum(facts.header_counts.values())
+                    page.links = len(facts.links)
+                    report.header_counts.update(facts.header_counts)
+                    ngram_totals.add(top_ngrams(facts.text, n=2, k=NGRAMS_PER_PAGE))
+                    if final_url != url:
+                        visited.add(canonicalize(final_url) or final_url)
+                    if depth < max_depth:
+                        base = urljoin(final_url, facts.base_href) if facts.base_href else final_url
+                        report.skipped_budget += _extend_frontier(frontier, visited, site, base, facts.links,
+                                                                  depth + 1)
+                if on_progress is not None:
+                    on_progress(report, len(frontier))
+    finally:
+        # Return as soon as a budget runs out: pages still downloading finish in the
+        # background and their results are dropped
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    report.skipped_budget += len(frontier)
+    report.top_bi_grams = ngram_totals.most_common(10)
+    report.elapsed = time.monotonic() - started
+    return report
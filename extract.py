@@ -0,0 +1,382 @@
+"""Single-pass extraction of the page facts every tab needs.
+
+The HTML is parsed once by a pluggable backend and its tree is walked once.
+``html.parser`` (pure Python, always available) is the fallback; ``lxml``
+and ``selectolax`` (lexbor) are C-backed and much faster on large pages.
+Pick one with the ``SECODE_PARSER`` environment variable, or leave it at
+``auto`` to use the fastest one installed (lxml, then selectolax). All
+backends produce the same header counts, links, meta description and
+visible text.
+
+``parse`` takes text, or the raw body plus its encoding (see charset.py).
+UTF-8 bodies go to the C parsers as bytes, without a decoded copy; other
+encodings are decoded first, because libxml2 stops at the first invalid
+byte of a multi-byte legacy encoding.
+
+The text is what a browser renders: ``<script>``, ``<style>`` and
+``<noscript>`` contents are dropped, inert subtrees (``<template>``,
+``<iframe>`` fallback) are skipped entirely, a CDATA section is text only
+inside ``<svg>`` or ``<math>``, and whitespace is collapsed while the text
+is collected.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+
+HEADER_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+# Elements whose contents are code, not page text
+CODE_TAGS = frozenset(['script', 'style'])
+# Elements whose contents are never part of the rendered page
+INERT_TAGS = frozenset(['template', 'iframe'])
+# Elements whose text is not rendered; links and headers inside still count,
+# except in INERT_TAGS, whose subtrees are skipped entirely
+HIDDEN_TAGS = CODE_TAGS | INERT_TAGS | frozenset(['noscript'])
+# rel values that tell crawlers not to follow a link
+NOFOLLOW_RELS = frozenset(['nofollow', 'ugc', 'sponsored'])
+# SVG and MathML: the only places where a CDATA section is text (elsewhere it is a comment)
+FOREIGN_TAGS = frozenset(['svg', 'math'])
+
+PARSER = os.environ.get('SECODE_PARSER', 'auto')
+
+# libxml2 stops at </html>; browsers (and the other backends) keep going. The end
+# tags are dropped, except inside comments and raw text elements, which are
+# matched first and kept as they are (a script may contain "</body>" as a string)
+_END_TAG = r'</(?:body|html)\s*>'
+_DOCUMENT_END = re.compile(rf'(<!--.*?-->|<(script|style|textarea|title)\b.*?</\2\s*>)|{_END_TAG}',
+                           re.IGNORECASE | re.DOTALL)
+_DOCUMENT_END_BYTES = re.compile(_DOCUMENT_END.pattern.encode('ascii'), re.IGNORECASE | re.DOTALL)
+_END_TAGS = re.compile(_END_TAG, re.IGNORECASE)
+_END_TAGS_BYTES = re.compile(_END_TAG.encode('ascii'), re.IGNORECASE)
+
+
+@dataclass
+class PageFacts:
+    header_counts: dict = field(default_factory=dict)
+    links: list = field(default_factory=list)
+    meta_description: str = None
+    # Visible text, whitespace collapsed to single spaces
+    text: str = ""
+    css_code: str = ""
+    js_code: str = ""
+    # External <link rel="stylesheet" href> and <script src> URLs, as written
+    stylesheet_urls: list = field(default_factory=list)
+    script_urls: list = field(default_factory=list)
+    # <a href> values whose rel is nofollow, ugc or sponsored, and the first <base href>
+    nofollow_links: list = field(default_factory=list)
+    base_href: str = None
+
+
+def _utf8_or_text(html, encoding):
+    """``html`` as UTF-8 bytes without a BOM, or as text when it is text or in another encoding."""
+    if not isinstance(html, bytes):
+        return html
+    from charset import decode, is_utf8, strip_bom
+
+    encoding = encoding or 'utf-8'
+    return strip_bom(html, encoding) if is_utf8(encoding) else decode(html, encoding)
+
+
+def _is_cdata_comment(text):
+    return text is not None and text.startswith('[CDATA[') and text.endswith(']]')
+
+
+def _strip_document_end(html):
+    """``html`` (text or bytes) without its ``</body>`` and ``</html>`` tags, for libxml2."""
+    is_bytes = isinstance(html, bytes)
+    end_tags = _END_TAGS_BYTES if is_bytes else _END_TAGS
+    first = end_tags.search(html)
+    if first is None:
+        return html
+    # Usually the end tags only close the document: cut them off without a full scan
+    if not end_tags.sub(b'' if is_bytes else '', html[first.start():]).strip():
+        return html[:first.start()]
+    document_end = _DOCUMENT_END_BYTES if is_bytes else _DOCUMENT_END
+    return document_end.sub(lambda match: match.group(1) or html[:0], html)
+
+
+def rel_tokens(rel):
+    """The lowercase tokens of a ``rel`` attribute value (string or bs4 token list)."""
+    if isinstance(rel, (list, tuple)):
+        rel = " ".join(rel)
+    return (rel or "").lower().split()
+
+
+def is_stylesheet(rel):
+    return 'stylesheet' in rel_tokens(rel)
+
+
+def is_nofollow(rel):
+    """True when ``rel`` tells crawlers not to follow the link (nofollow, ugc, sponsored)."""
+    return not NOFOLLOW_RELS.isdisjoint(rel_tokens(rel))
+
+
+class _FactsBuilder:
+    """Accumulates facts while a backend walks its tree in document order."""
+
+    def __init__(self):
+        self.header_counts = {}
+        self.links = []
+        self.meta_found = False
+        self.meta_description = None
+        self.text_parts = []
+        self.styles = []
+        self.scripts = []
+        self.stylesheet_urls = []
+        self.script_urls = []
+        self.nofollow_links = []
+        self.base_href = None
+
+    def element(self, name, get_attr, get_code):
+        if name in HEADER_TAGS:
+            self.header_counts[name] = self.header_counts.get(name, 0) + 1
+        elif name == 'a':
+            href = get_attr('href')
+            if href is not None:
+                self.links.append(href)
+                if is_nofollow(get_attr('rel')):
+                    self.nofollow_links.append(href)
+        elif name == 'style':
+            self.styles.append(get_code() or "")
+        elif name == 'script':
+            self.scripts.append(get_code() or "")
+            src = get_attr('src')
+            if src:
+                self.script_urls.append(src)
+        elif name == 'link':
+            href = get_attr('href')
+            if href and is_stylesheet(get_attr('rel')):
+                self.stylesheet_urls.append(href)
+        elif name == 'base' and self.base_href is None:
+            self.base_href = get_attr('href') or None
+        elif name == 'meta' and not self.meta_found and get_attr('name') == 'description':
+            self.meta_found = True
+            self.meta_description = get_attr('content')
+
+    def text(self, value):
+        # Collapse whitespace chunk by chunk so the joined text needs no second pass
+        if value:
+            value = " ".join(value.split())
+            if value:
+                self.text_parts.append(value)
+
+    def build(self):
+        return PageFacts(
+            header_counts=self.header_counts,
+            links=self.links,
+            meta_description=self.meta_description,
+            text=" ".join(self.text_parts),
+            css_code="\n".join(self.styles),
+            js_code="\n".join(self.scripts),
+            stylesheet_urls=self.stylesheet_urls,
+            script_urls=self.script_urls,
+            nofollow_links=self.nofollow_links,
+            base_href=self.base_href,
+        )
+
+
+class HtmlParserBackend:
+    """BeautifulSoup with the standard library ``html.parser``."""
+
+    name = 'html.parser'
+
+    def available(self):
+        try:
+            import bs4  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def parse(self, html, encoding=None):
+        from bs4 import BeautifulSoup
+        if isinstance(html, bytes):
+            from charset import decode
+            # html.parser works on text either way
+            html = decode(html, encoding)
+        return BeautifulSoup(html, 'html.parser')
+
+    def collect_facts(self, soup):
+        from bs4.element import CData, NavigableString, Tag
+
+        facts = _FactsBuilder()
+        hidden = foreign = 0
+        # Depth-first walk over .contents so inert subtrees can be skipped
+        stack = [(iter(soup.contents), False, False)]
+        while stack:
+            children, is_hidden, is_foreign = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+                hidden -= is_hidden
+                foreign -= is_foreign
+            elif isinstance(node, Tag):
+                facts.element(node.name, node.get, lambda: node.string)
+                if node.name not in INERT_TAGS:
+                    is_hidden = node.name in HIDDEN_TAGS
+                    is_foreign = node.name in FOREIGN_TAGS
+                    hidden += is_hidden
+                    foreign += is_foreign
+                    stack.append((iter(node.contents), is_hidden, is_foreign))
+            elif not hidden and (type(node) is NavigableString or foreign and type(node) is CData):
+                facts.text(str(node))
+        return facts.build()
+
+
+class LxmlBackend:
+    """``lxml.html`` (libxml2)."""
+
+    name = 'lxml'
+
+    def available(self):
+        try:
+            import lxml.html  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def parse(self, html, encoding=None):
+        import lxml.html
+        html = _utf8_or_text(html, encoding)
+        if isinstance(html, bytes):
+            html = _strip_document_end(html)
+            if not html.strip():
+                html = b'<html></html>'
+            return lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding='utf-8'))
+        html = _strip_document_end(html)
+        if not html.strip():
+            html = '<html></html>'
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # str input with an XML encoding declaration must be passed as bytes
+            return lxml.html.document_fromstring(html.encode('utf-8'))
+
+    def collect_facts(self, root):
+        from lxml import etree
+
+        facts = _FactsBuilder()
+        hidden = inert = foreign = 0
+        for event, el in etree.iterwalk(root, events=('start', 'end', 'comment', 'pi')):
+            if event == 'start':
+                if not inert:
+                    facts.element(el.tag, el.get, lambda: el.text)
+                inert += el.tag in INERT_TAGS
+                hidden += el.tag in HIDDEN_TAGS
+                foreign += el.tag in FOREIGN_TAGS
+                if not hidden:
+                    facts.text(el.text)
+            else:
+                if event == 'end':
+                    inert -= el.tag in INERT_TAGS
+                    hidden -= el.tag in HIDDEN_TAGS
+                    foreign -= el.tag in FOREIGN_TAGS
+                elif event == 'comment' and foreign and not hidden and _is_cdata_comment(el.text):
+                    # libxml2 keeps a CDATA section as the comment "[CDATA[...]]"
+                    facts.text(el.text[len('[CDATA['):-len(']]')])
+                # The tail is the text that follows this node inside its parent
+                if not hidden:
+                    facts.text(el.tail)
+        return facts.build()
+
+
+class SelectolaxBackend:
+    """``selectolax`` with the lexbor engine."""
+
+    name = 'selectolax'
+
+    def available(self):
+        try:
+            import selectolax.lexbor  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def parse(self, html, encoding=None):
+        from selectolax.lexbor import LexborHTMLParser
+        # lexbor reads bytes as UTF-8
+        return LexborHTMLParser(_utf8_or_text(html, encoding))
+
+    def collect_facts(self, tree):
+        facts = _FactsBuilder()
+        if tree.root is None:
+            return facts.build()
+        # traverse() has no end events, so remember each element's (inert, hidden)
+        # state; parents are always visited before their children
+        states = {}
+        for node in tree.root.traverse(include_text=True):
+            tag = node.tag
+            parent = node.parent
+            inert, hidden = states.get(parent.mem_id, (False, False)) if parent is not None else (False, False)
+            if tag == '-text':
+                if not hidden:
+                    facts.text(node.text_content)
+            elif not tag.startswith(('_', '-', '!')):
+                states[node.mem_id] = (inert or tag in INERT_TAGS, hidden or tag in HIDDEN_TAGS)
+                if inert:
+                    continue
+                attrs = node.attributes
+
+                def get_attr(key, attrs=attrs):
+                    # Valueless attributes come back as None; bs4 reports ""
+                    return attrs[key] or "" if key in attrs else None
+
+                facts.element(tag, get_attr, lambda: node.text(deep=True))
+        return facts.build()
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (LxmlBackend(), SelectolaxBackend(), HtmlParserBackend())
+}
+
+
+def available_backends():
+    """Names of the installed backends, fastest first."""
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def get_backend(name=None):
+    """Return the backend called ``name`` (default ``SECODE_PARSER``); ``auto`` picks the fastest installed."""
+    name = name or PARSER
+    if name == 'auto':
+        return BACKENDS[available_backends()[0]]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {name!r}, expected one of {sorted(BACKENDS)} or 'auto'")
+    return BACKENDS[name]
+
+
+def extract_facts(html, backend=None, encoding=None):
+    """Parse ``html`` (text, or bytes in ``encoding``) once and return its ``PageFacts``."""
+    backend = get_backend(backend)
+    return backend.collect_facts(backend.parse(html, encoding))
+
+
+def conformance(html, backends=None, encoding=None):
+    """Compare the facts of every installed backend against ``html.parser``.
+
+    ``html`` is text, or bytes in ``encoding`` as for ``extract_facts``.
+
+    Returns ``{backend: [field, ...]}`` listing the fields that differ, so an
+    empty dict means all backends agree on ``html``.
+    """
+    def comparable(facts):
+        return {
+            'header_counts': facts.header_counts,
+            'links': facts.links,
+            'meta_description': facts.meta_description,
+            'text': facts.text,
+            'stylesheet_urls': facts.stylesheet_urls,
+            'script_urls': facts.script_urls,
+            'nofollow_links': facts.nofollow_links,
+            'base_href': facts.base_href,
+            'css_code': facts.css_code,
+            'js_code': facts.js_code,
+        }
+
+    expected = comparable(extract_facts(html, 'html.parser', encoding))
+    mismatches = {}
+    for name in backends or available_backends():
+        actual = comparable(extract_facts(html, name, encoding))
+        different = [key for key in expected if actual[key] != expected[key]]
+        if different:
+            mismatches[name] = different
+    return mismatches
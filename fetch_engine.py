@@ -0,0 +1,352 @@
+"""Asynchronous page fetching for the app, bulk analysis and crawls.
+
+One asyncio event loop per process runs in a dedicated daemon thread and
+owns a single ``httpx.AsyncClient``, so every caller shares its
+connections:
+
+- HTTP/2 where the server offers it (when ``h2`` is installed): requests to
+  one host are multiplexed over a single connection;
+- keep-alive connections and one shared SSL context, so a host pays for
+  the TCP and TLS handshakes once instead of once per page;
+- an in-process DNS cache with a TTL in front of every new connection;
+- a global semaphore and one semaphore per host bound the requests in
+  flight;
+- GET and HEAD requests answered with 429 or a 5xx status are retried with
+  backoff, as ``http_client``'s session does.
+
+``fetch(url)`` has the signature of ``http_client.fetch`` and blocks the
+calling thread (the Streamlit script thread, a worker of a thread pool, a
+batch job); ``await fetch_async(url)`` does the same from any event loop.
+Errors are ``requests.RequestException`` subclasses either way, so callers
+handle both clients alike. Without httpx installed, requests go through the
+shared ``requests`` session in worker threads, still under the semaphores.
+"""
+import asyncio
+import ipaddress
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import http_client
+from http_client import MAX_BODY_BYTES, TIMEOUT, ResponseTooLarge
+
+try:
+    import httpcore
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = httpx is not None
+except ImportError:
+    HTTP2 = False
+
+# Requests in flight across all hosts, and to any one host
+MAX_IN_FLIGHT = 64
+PER_HOST = 6
+# Seconds a resolved address is reused (getaddrinfo does not report the record TTL)
+DNS_TTL = 300
+MAX_DNS_ENTRIES = 4096
+# Idle connections are kept this long for the next request to the same host
+KEEPALIVE_EXPIRY = 60
+# Like http_client's session: GET/HEAD answered with one of these statuses are retried
+# with exponential backoff (or after the Retry-After delay, up to MAX_RETRY_AFTER seconds)
+RETRIES = 2
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+MAX_RETRY_AFTER = 15
+
+
+class FetchError(requests.RequestException):
+    """A request made by the engine failed (connection, TLS, timeout, redirect loop...)."""
+
+
+@dataclass
+class FetchResponse:
+    url: str
+    status_code: int
+    headers: CaseInsensitiveDict
+    content: bytes
+    # 'HTTP/1.1' or 'HTTP/2'
+    http_version: str = 'HTTP/1.1'
+
+
+class DnsCache:
+    """Host name -> addresses, shared by every connection the engine opens."""
+
+    def __init__(self, ttl=DNS_TTL, max_entries=MAX_DNS_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        # Lookups in progress, so concurrent connections to a new host resolve it once
+        self._pending = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    async def resolve(self, host, port):
+        """The addresses of ``host``, most recently resolved at most ``ttl`` seconds ago."""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        entry = self._entries.get(host)
+        if entry is not None and entry[1] > time.monotonic():
+            self.stats['hits'] += 1
+            return entry[0]
+        pending = self._pending.get(host)
+        if pending is None:
+            self.stats['misses'] += 1
+            pending = self._pending[host] = asyncio.ensure_future(self._lookup(host, port))
+            pending.add_done_callback(lambda _: self._pending.pop(host, None))
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, host, port):
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            self._entries = {name: entry for name, entry in self._entries.items() if entry[1] > now}
+        self._entries[host] = (addresses, time.monotonic() + self.ttl)
+        return addresses
+
+
+class _CachedDnsBackend:
+    """httpcore network backend that connects to addresses from a ``DnsCache``.
+
+    TLS still verifies and sends SNI for the host name: httpcore passes it to
+    ``start_tls`` separately from the address connected to.
+    """
+
+    def __init__(self, dns):
+        self.dns = dns
+        self.backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await self.dns.resolve(host, port)
+        except (OSError, UnicodeError, ValueError) as exc:
+            # UnicodeError: a host name the IDNA codec rejects (empty or over-long label)
+            raise httpcore.ConnectError(f"{host}: {exc}") from exc
+        for index, address in enumerate(addresses):
+            try:
+                return await self.backend.connect_tcp(address, port, timeout=timeout, local_address=local_address,
+                                                      socket_options=socket_options)
+            except httpcore.ConnectError:
+                # Try the host's next address
+                if index == len(addresses) - 1:
+                    raise
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self.backend.sleep(seconds)
+
+
+def _make_client(dns, max_connections, http2):
+    # ALPN offers h2 only when the context is built for it
+    ssl_context = httpx.create_ssl_context(http2=http2)
+
+    class Transport(httpx.AsyncHTTPTransport):
+        def __init__(self):
+            super().__init__(verify=ssl_context, http2=http2, retries=2)
+            # Same pool httpx builds, with the DNS cache as its network backend
+            self._pool = httpcore.AsyncConnectionPool(
+                ssl_context=ssl_context,
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+                http2=http2,
+                retries=2,
+                network_backend=_CachedDnsBackend(dns),
+            )
+
+    return httpx.AsyncClient(
+        transport=Transport(),
+        headers={'User-Agent': http_client.USER_AGENT, 'Accept-Encoding': http_client.ACCEPT_ENCODING},
+        follow_redirects=True,
+    )
+
+
+async def _read_body(response, max_bytes):
+    declared = response.headers.get('Content-Length')
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ResponseTooLarge(f"{response.url} declares {declared} bytes (limit {max_bytes})")
+    chunks = []
+    received = 0
+    async for chunk in response.aiter_bytes():
+        received += len(chunk)
+        if received > max_bytes:
+            raise ResponseTooLarge(f"{response.url} exceeded {max_bytes} bytes")
+        chunks.append(chunk)
+    return chunks
+
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before retrying ``response``'s request, or ``None`` when it is final."""
+    if response.status_code not in RETRY_STATUSES:
+        return None
+    retry_after = response.headers.get('Retry-After', '')
+    if retry_after.isdigit():
+        return min(int(retry_after), MAX_RETRY_AFTER)
+    return RETRY_BACKOFF * 2 ** attempt
+
+
+class FetchEngine:
+    """The event loop thread, its HTTP client and the concurrency limits."""
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, per_host=PER_HOST, dns_ttl=DNS_TTL, http2=HTTP2):
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.http2 = http2 and httpx is not None
+        self.dns = DnsCache(dns_ttl)
+        self.stats = {'requests': 0, 'http2': 0, 'errors': 0, 'retries': 0}
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._in_flight = None
+        # host -> [semaphore, requests holding or waiting for it]; dropped when idle
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name='secode-fetch', daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def _host_slot(self, host):
+        entry = self._host_slots.get(host)
+        if entry is None:
+            entry = self._host_slots[host] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_host_slot(self, host):
+        # Only the loop thread touches the slots, so no lock is needed
+        entry = self._host_slots[host]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._host_slots[host]
+
+    def fetch(self, url, headers=None, timeout=TIMEOUT, max_bytes=MAX_BODY_BYTES, method='GET'):
+        """Fetch ``url`` and return a ``FetchResponse``; blocks the calling thread."""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("fetch() would block the fetch engine's own loop; await fetch_async() instead")
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, headers, timeout, max_bytes, method), loop)
+        return future.result()
+
+    async def fetch_async(self, url, headers=None, timeout=TIMEOUT, max_bytes=MAX_BODY_BYTES, method='GET'):
+        """Like ``fetch``, awaitable from any event loop."""
+        loop = self._ensure_loop()
+        coroutine = self._fetch(url, headers, timeout, max_bytes, method)
+        if asyncio.get_running_loop() is loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+    def fetch_many(self, urls, **kwargs):
+        """Fetch every URL concurrently; returns a ``FetchResponse`` or the exception, per URL in order."""
+        async def gather():
+            return await asyncio.gather(*(self.fetch_async(url, **kwargs) for url in urls), return_exceptions=True)
+
+        return asyncio.run_coroutine_threadsafe(gather(), self._ensure_loop()).result()
+
+    async def _fetch(self, url, headers, timeout, max_bytes, method):
+        # Created here so they belong to the engine's loop
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self.stats['requests'] += 1
+        try:
+            try:
+                parts = urlsplit(url)
+                # Reading the port validates it: out of range, the connect call would fail outside httpx's errors
+                parts.port
+            except ValueError as exc:
+                raise FetchError(f"{url}: {exc}") from exc
+            host = parts.hostname or url
+            slot = self._host_slot(host)
+            try:
+                async with self._in_flight, slot:
+                    if httpx is None:
+                        return await self._fetch_in_thread(url, headers, timeout, max_bytes, method)
+                    return await self._fetch_httpx(url, headers, timeout, max_bytes, method)
+            finally:
+                self._release_host_slot(host)
+        except requests.RequestException:
+            self.stats['errors'] += 1
+            raise
+
+    async def _fetch_httpx(self, url, headers, timeout, max_bytes, method):
+        if self._client is None:
+            self._client = _make_client(self.dns, self.max_in_flight, self.http2)
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        retries = RETRIES if method in ('GET', 'HEAD') else 0
+        for attempt in range(retries + 1):
+            try:
+                async with self._client.stream(method, url, headers=headers,
+                                               timeout=httpx.Timeout(read, connect=connect)) as response:
+                    # The body of a response that is retried is not read
+                    delay = _retry_delay(response, attempt) if attempt < retries else None
+                    if delay is None:
+                        chunks = await _read_body(response, max_bytes)
+            except (httpx.HTTPError, httpx.InvalidURL) as exc:
+                raise FetchError(f"{url}: {exc.__class__.__name__}: {exc}") from exc
+            if delay is None:
+                break
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay)
+        if response.http_version == 'HTTP/2':
+            self.stats['http2'] += 1
+        return FetchResponse(str(response.url), response.status_code, CaseInsensitiveDict(response.headers.items()),
+                             b''.join(chunks), response.http_version)
+
+    async def _fetch_in_thread(self, url, headers, timeout, max_bytes, method):
+        response = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: http_client.fetch(url, headers=headers, timeout=timeout, max_bytes=max_bytes, method=method))
+        return FetchResponse(response.url, response.status_code, CaseInsensitiveDict(response.headers),
+                             response.content)
+
+    def close(self):
+        """Close the connections and stop the loop thread (the next fetch starts them again)."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        client, self._client = self._client, None
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+        self._in_flight = None
+        self._host_slots = {}
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+
+# Shared by every session and job in this process
+engine = FetchEngine()
+
+
+def fetch(url, headers=None, timeout=TIMEOUT, max_bytes=MAX_BODY_BYTES, method='GET'):
+    return engine.fetch(url, headers=headers, timeout=timeout, max_bytes=max_bytes, method=method)
+
+
+async def fetch_async(url, headers=None, timeout=TIMEOUT, max_bytes=MAX_BODY_BYTES, method='GET'):
+    return await engine.fetch_async(url, headers=headers, timeout=timeout, max_bytes=max_bytes, method=method)
@@ -0,0 +1,34 @@
+"""Content fingerprints of fetched HTML, used to skip re-analyzing unchanged pages.
+
+``exact_hash`` is the SHA-256 of the raw body. ``normalized_hash`` also
+matches pages that differ only in markup that changes on every request and
+that no fact is read from: comments, CSP nonces, and the values of CSRF
+tokens in hidden inputs and ``<meta>`` tags. Links, text and scripts are
+hashed as they are, so a page whose content changed is always analyzed again.
+"""
+import hashlib
+import re
+
+# Comments ("generated in 0.12s", cache timestamps, ...)
+_COMMENT = re.compile(rb'<!--.*?-->', re.DOTALL)
+# nonce="..." on inline scripts and styles
+_NONCE = re.compile(rb'''\snonce\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)''', re.IGNORECASE)
+# <input name="csrf_token" value="..."> and <meta name="csrf-token" content="...">
+_TOKEN_TAG = re.compile(
+    rb'''<(?:input|meta)\b[^>]*\bname\s*=\s*["']?[^"'\s>]*(?:csrf|xsrf|authenticity|token)[^>]*>''', re.IGNORECASE)
+_TOKEN_VALUE = re.compile(rb'''\b(value|content)\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)''', re.IGNORECASE)
+
+
+def exact_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def normalize(body):
+    """``body`` (bytes) with the volatile parts removed or replaced by fixed placeholders."""
+    body = _COMMENT.sub(b'', body)
+    body = _NONCE.sub(b'', body)
+    return _TOKEN_TAG.sub(lambda match: _TOKEN_VALUE.sub(rb'\1="#"', match.group()), body)
+
+
+def normalized_hash(body):
+    return hashlib.sha256(normalize(body)).hexdigest()
@@ -0,0 +1,80 @@
+"""Shared HTTP client for every outbound page fetch.
+
+One keep-alive ``requests.Session`` per process with connect/read timeouts,
+limited retries with backoff, gzip/brotli decoding and a hard cap on the
+decoded body size so a slow or huge site cannot tie up a worker.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br" responses)
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (5, 15)
+MAX_BODY_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+POOL_SIZE = 32
+USER_AGENT = 'SECODE/1.0'
+
+
+class ResponseTooLarge(requests.RequestException):
+    """The response body exceeded ``max_bytes`` and the download was stopped."""
+
+
+def make_session(pool_size=POOL_SIZE, retries=2, backoff_factor=0.5):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+    return session
+
+
+session = make_session()
+
+
+def open_stream(url, headers=None, timeout=TIMEOUT, method='GET'):
+    """Start a request through the shared session without reading the body.
+
+    Use the returned response as a context manager and read it with ``iter_body``.
+    """
+    return session.request(method, url, headers=headers, timeout=timeout, stream=True)
+
+
+def iter_body(response, max_bytes=MAX_BODY_BYTES, chunk_size=CHUNK_SIZE):
+    """Yield decoded body chunks, raising ``ResponseTooLarge`` past ``max_bytes``."""
+    declared = response.headers.get('Content-Length')
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ResponseTooLarge(f"{response.url} declares {declared} bytes (limit {max_bytes})", response=response)
+    received = 0
+    for chunk in response.iter_content(chunk_size):
+        received += len(chunk)
+        if received > max_bytes:
+            raise ResponseTooLarge(f"{response.url} exceeded {max_bytes} bytes", response=response)
+        yield chunk
+
+
+def fetch(url, headers=None, timeout=TIMEOUT, max_bytes=MAX_BODY_BYTES, method='GET'):
+    """Fetch ``url`` through the shared session and return the ``requests.Response``.
+
+    The body is streamed and the download is aborted with ``ResponseTooLarge``
+    as soon as more than ``max_bytes`` of decoded content arrive.
+    """
+    with open_stream(url, headers=headers, timeout=timeout, method=method) as response:
+        body = b''.join(iter_body(response, max_bytes))
+    # Hand back a fully read response so .content and .text work as usual
+    response._content = body
+    response._content_consumed = True
+    return response
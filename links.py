@@ -0,0 +1,173 @@
+"""Link index of a page: every ``<a href>`` resolved, classified and de-duplicated.
+
+Hrefs are resolved against the page URL (or its ``<base href>``), so
+relative, protocol-relative and plain ``http://`` links are all kept. Each
+distinct target is marked internal or external and followed or nofollow.
+``check_links`` optionally sends concurrent HEAD requests through the shared
+HTTP session to flag broken links, within a time budget and with a per-URL
+result cache shared by every analysis in the process.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from urllib.parse import urljoin
+
+from crawl import canonicalize, site_of
+from metrics import stage
+
+CHECK_WORKERS = 16
+# Seconds one check_links call may take; links not checked by then are reported as such
+CHECK_TIME_BUDGET = 15
+# Check results are reused for this many seconds
+CHECK_TTL = 60 * 60
+MAX_CACHED_CHECKS = 20000
+# Requests in flight per host while checking
+CHECK_PER_HOST = 4
+NOT_CHECKED = "Not checked (time budget)"
+
+
+@dataclass
+class Link:
+    url: str
+    # The href as first written in the page
+    href: str
+    internal: bool
+    # True when every occurrence of the link has rel=nofollow/ugc/sponsored
+    nofollow: bool
+    count: int = 1
+    status: int = None
+    error: str = None
+
+    @property
+    def broken(self):
+        if self.status is not None:
+            return self.status >= 400
+        return self.error is not None and self.error != NOT_CHECKED
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'href': self.href,
+            'internal': self.internal,
+            'nofollow': self.nofollow,
+            'count': self.count,
+            'status': self.status,
+            'error': self.error,
+        }
+
+
+def build_link_index(page_url, facts):
+    """Resolve, classify and de-duplicate the links of a page, in document order.
+
+    Links to other schemes (``mailto:``, ``javascript:``, ``tel:``, ...) are
+    left out; a link to an anchor on the page itself resolves to the page.
+    """
+    base = urljoin(page_url, facts.base_href) if facts.base_href else page_url
+    site = site_of(page_url)
+    nofollow = set(facts.nofollow_links)
+    index = {}
+    for href in facts.links:
+        url = canonicalize(urljoin(base, href.strip()))
+        if url is None:
+            continue
+        link = index.get(url)
+        if link is None:
+            index[url] = Link(url, href, internal=site_of(url) == site, nofollow=href in nofollow)
+        else:
+            link.count += 1
+            link.nofollow = link.nofollow and href in nofollow
+    return list(index.values())
+
+
+class LinkChecker:
+    """Concurrent link health checks with a per-URL cache of recent results."""
+
+    def __init__(self, workers=CHECK_WORKERS, ttl=CHECK_TTL, max_entries=MAX_CACHED_CHECKS):
+        self.workers = workers
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._results = {}
+        self._lock = threading.Lock()
+        self.stats = {'checked': 0, 'cached': 0}
+
+    def cached(self, url):
+        with self._lock:
+            entry = self._results.get(url)
+        if entry is not None and time.monotonic() - entry[2] < self.ttl:
+            return entry[0], entry[1]
+        return None
+
+    def _remember(self, url, status, error):
+        with self._lock:
+            if len(self._results) >= self.max_entries:
+                # Drop the oldest half; dicts keep insertion order
+                for stale in list(self._results)[:self.max_entries // 2]:
+                    del self._results[stale]
+            self._results[url] = (status, error, time.monotonic())
+
+    def check_one(self, url, limiter):
+        """HEAD ``url`` (falling back to GET for servers that refuse HEAD); returns ``(status, error)``."""
+        import requests
+
+        import http_client
+
+        try:
+            with limiter(url):
+                with http_client.open_stream(url, method='HEAD') as response:
+                    status = response.status_code
+                if status in (405, 501):
+                    # The body is never read: closing the stream drops the connection
+                    with http_client.open_stream(url) as response:
+                        status = response.status_code
+            result = (status, None)
+        except requests.RequestException as exc:
+            result = (None, exc.__class__.__name__)
+        self._remember(url, *result)
+        with self._lock:
+            self.stats['checked'] += 1
+        return result
+
+    def check(self, links, time_budget=CHECK_TIME_BUDGET):
+        """Fill in ``status``/``error`` of every ``Link`` in ``links`` within ``time_budget`` seconds."""
+        with stage('link_check') as record:
+            record.cache = 'hit'
+            return self._check(links, time_budget, record)
+
+    def _check(self, links, time_budget, record):
+        from bulk import HostLimiter
+
+        pending = []
+        for link in links:
+            result = self.cached(link.url)
+            if result is None:
+                pending.append(link)
+            else:
+                link.status, link.error = result
+                with self._lock:
+                    self.stats['cached'] += 1
+        if not pending:
+            return links
+        record.cache = 'miss'
+
+        limiter = HostLimiter(per_host=CHECK_PER_HOST, delay=0)
+        pool = ThreadPoolExecutor(max_workers=min(self.workers, len(pending)), thread_name_prefix='secode-links')
+        try:
+            futures = {pool.submit(self.check_one, link.url, limiter): link for link in pending}
+            done, _ = wait(futures, timeout=time_budget)
+            for future, link in futures.items():
+                if future in done:
+                    link.status, link.error = future.result()
+                else:
+                    link.status, link.error = None, NOT_CHECKED
+        finally:
+            # Do not wait for checks still running past the budget; they only fill the cache
+            pool.shutdown(wait=False, cancel_futures=True)
+        return links
+
+
+link_checker = LinkChecker()
+
+
+def check_links(links, time_budget=CHECK_TIME_BUDGET):
+    return link_checker.check(links, time_budget)
@@ -0,0 +1,160 @@
+"""Per-stage timing of the analysis pipeline.
+
+Code on the hot path wraps each stage in ``stage(name)``, which measures the
+wall time and lets the stage note the bytes it processed and whether a
+cache answered. Every measurement feeds three consumers:
+
+- the current ``trace()`` (shown in the app's "Performance" expander);
+- process-wide Prometheus metrics, served by ``serve(port)`` or via
+  ``SECODE_METRICS_PORT``;
+- a JSON log line on the ``secode.metrics`` logger, when INFO is enabled.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+logger = logging.getLogger('secode.metrics')
+
+_trace = contextvars.ContextVar('secode_trace', default=None)
+_lock = threading.Lock()
+# stage -> [bucket counts..., count, sum]
+_latency = {}
+_bytes = {}
+# (stage, outcome) -> count
+_cache = {}
+_server = None
+_serve_failed = False
+
+
+@dataclass
+class StageTiming:
+    stage: str
+    seconds: float = 0.0
+    bytes: int = None
+    # 'hit', 'miss', 'revalidated', ... when a cache was consulted
+    cache: str = None
+
+
+@contextmanager
+def trace(timings=None):
+    """Collect the ``StageTiming`` of every stage run inside the block into a list (yielded)."""
+    timings = [] if timings is None else timings
+    token = _trace.set(timings)
+    try:
+        yield timings
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time the block as stage ``name``; set ``.bytes`` and ``.cache`` on the yielded record."""
+    record = StageTiming(name)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - started
+        _record(record)
+
+
+def _record(record):
+    timings = _trace.get()
+    if timings is not None:
+        timings.append(record)
+    with _lock:
+        histogram = _latency.get(record.stage)
+        if histogram is None:
+            histogram = _latency[record.stage] = [0] * (len(BUCKETS) + 2)
+        for index, bound in enumerate(BUCKETS):
+            if record.seconds <= bound:
+                histogram[index] += 1
+        histogram[-2] += 1
+        histogram[-1] += record.seconds
+        if record.bytes is not None:
+            _bytes[record.stage] = _bytes.get(record.stage, 0) + record.bytes
+        if record.cache is not None:
+            key = (record.stage, record.cache)
+            _cache[key] = _cache.get(key, 0) + 1
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'event': 'stage', **asdict(record)}))
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        latency = {name: list(values) for name, values in _latency.items()}
+        processed = dict(_bytes)
+        cache = dict(_cache)
+    lines = [
+        "# HELP secode_stage_seconds Wall time of each analysis pipeline stage.",
+        "# TYPE secode_stage_seconds histogram",
+    ]
+    for name, values in sorted(latency.items()):
+        for bound, count in zip(BUCKETS, values):
+            lines.append(f'secode_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'secode_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {values[-2]}')
+        lines.append(f'secode_stage_seconds_count{{stage="{name}"}} {values[-2]}')
+        lines.append(f'secode_stage_seconds_sum{{stage="{name}"}} {values[-1]:.6f}')
+    lines += [
+        "# HELP secode_stage_bytes_total Bytes processed by each stage.",
+        "# TYPE secode_stage_bytes_total counter",
+    ]
+    lines += [f'secode_stage_bytes_total{{stage="{name}"}} {total}' for name, total in sorted(processed.items())]
+    lines += [
+        "# HELP secode_cache_lookups_total Cache outcomes of the stages that consult a cache.",
+        "# TYPE secode_cache_lookups_total counter",
+    ]
+    lines += [f'secode_cache_lookups_total{{stage="{name}",result="{outcome}"}} {count}'
+              for (name, outcome), count in sorted(cache.items())]
+    return "\n".join(lines) + "\n"
+
+
+def serve(port, host='127.0.0.1'):
+    """Serve ``/metrics`` on ``host:port`` from a daemon thread (once per process)."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_server.serve_forever, name='secode-metrics', daemon=True).start()
+        return _server
+
+
+def serve_from_env():
+    """Start the metrics endpoint when ``SECODE_METRICS_PORT`` is set."""
+    global _serve_failed
+    port = os.environ.get('SECODE_METRICS_PORT')
+    if not port or _serve_failed:
+        return None
+    try:
+        return serve(int(port))
+    except OSError as exc:
+        # Another process (a second app server, the monitor) already has the port
+        _serve_failed = True
+        logger.warning("metrics endpoint not started on port %s: %s", port, exc)
+        return None
@@ -0,0 +1,144 @@
+"""Scheduled re-analysis of the domains on the watchlist.
+
+A scheduler thread, never a Streamlit script run, polls the watchlist in the
+result store and hands due URLs to a bounded worker pool. Requests are
+spaced per host by ``bulk.HostLimiter``, and each run's next time is jittered
+so domains added together drift apart instead of all firing at once. Results
+are written to the history store; the app only reads them.
+
+Run it next to the app with ``python secode_cli.py monitor``; the Streamlit
+server also starts one in the background (see ``ensure_monitor``).
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from store import result_store
+
+DEFAULT_INTERVAL = 6 * 60 * 60
+MONITOR_WORKERS = 4
+# Each interval is stretched or shortened by up to this fraction
+JITTER = 0.1
+POLL_INTERVAL = 30
+# A claimed URL is retried after this many seconds if its worker died
+LEASE = 15 * 60
+# Politeness towards monitored sites: one request per host at a time, 2 s apart
+PER_HOST = 1
+HOST_DELAY = 2.0
+
+logger = logging.getLogger(__name__)
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+class Monitor:
+    """Background scheduler feeding due watchlist URLs to a bounded worker pool."""
+
+    def __init__(self, store=None, workers=MONITOR_WORKERS, jitter=JITTER, poll_interval=POLL_INTERVAL,
+                 limiter=None):
+        self.store = store or result_store
+        self.workers = workers
+        self.jitter = jitter
+        self.poll_interval = poll_interval
+        self.limiter = limiter
+        self.stats = {'runs': 0, 'failures': 0}
+        self._pool = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def next_run(self, interval):
+        return time.time() + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run_job(self, url, interval):
+        """Analyze ``url`` once and store the result (runs on a worker thread)."""
+        import analysis
+
+        error = None
+        try:
+            with self.limiter(url):
+                result = analysis.analyze(url)
+            if result is None:
+                error = "Failed to fetch content"
+            elif not result.coalesced:
+                self.store.save(result)
+        except Exception as exc:  # keep the worker alive whatever one page does
+            logger.exception("monitoring %s failed", url)
+            error = f"Analysis failed: {exc}"
+        try:
+            self.store.finish_run(url, self.next_run(interval), error)
+        except Exception:
+            # The lease makes the URL due again later
+            logger.exception("could not reschedule %s", url)
+        with self._lock:
+            self._in_flight -= 1
+            self.stats['runs'] += 1
+            if error:
+                self.stats['failures'] += 1
+        self._wake.set()
+
+    def run_once(self):
+        """Submit every due URL the pool has room for; returns how many were submitted."""
+        with self._lock:
+            free = self.workers - self._in_flight
+        if free <= 0:
+            return 0
+        due = self.store.claim_due(free, LEASE)
+        with self._lock:
+            self._in_flight += len(due)
+        for url, interval in due:
+            self._pool.submit(self.run_job, url, interval)
+        return len(due)
+
+    def run_forever(self):
+        """Poll the watchlist until ``stop()`` is called."""
+        if self.limiter is None:
+            from bulk import HostLimiter
+            self.limiter = HostLimiter(per_host=PER_HOST, delay=HOST_DELAY)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='secode-monitor')
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.exception("watchlist poll failed")
+                # Wake early when a worker frees up or the watchlist changes
+                self._wake.wait(self.poll_interval * random.uniform(0.5, 1.0))
+                self._wake.clear()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='secode-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        """Check the watchlist now instead of at the next poll."""
+        self._wake.set()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        self._wake.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+def ensure_monitor():
+    """Start the process-wide background monitor once and return it."""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = Monitor()
+        return _monitor.start()
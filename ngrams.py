@@ -0,0 +1,139 @@
+"""Vectorized n-gram counting for the Analysis tab.
+
+Text is tokenized with one compiled regex (close to nltk's Treebank
+tokenizer, without needing the punkt data; see tests/test_ngrams.py for
+where the two differ), tokens are interned to integer
+ids in a NumPy array, and every n-gram is packed into a single int64 key so
+counting is one ``np.unique`` call. Only the top-k n-grams are ever turned
+back into tuples. Ties are ordered by first occurrence, like
+``Counter.most_common``.
+"""
+import re
+
+import numpy as np
+
+# Characters the Treebank tokenizer always splits off a word
+_SPLIT = r"""\s,;:@#$%&?!()\[\]{}<>"'`"""
+TOKEN_RE = re.compile(rf"""
+    n't\b
+  | (?: [^{_SPLIT}.-]+              # a run of ordinary characters, which may contain
+      | \.(?=[^{_SPLIT}.])          # inner periods (domains, U.S, 3.14),
+      | (?<=\d)[,:](?=\d)           # digit separators (1,000 and 10:30)
+      | (?<!-)-(?!-)                # and single hyphens
+    )+
+  | '(?:[sdmSDM]|re|ve|ll|RE|VE|LL)\b  # clitics: 's 're 've 'll 'd 'm
+  | \.\.\.
+  | --
+  | `` | ''                        # opening and closing double quotes
+  | [^\w\s]                        # any other symbol on its own
+""", re.VERBOSE)
+
+# Small English stopword list for optional filtering
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+
+# Typographic quotes and the em dash are split off too; they are spaced out before
+# the regex runs, which keeps its character classes ASCII-only (and fast)
+_SPACED_OUT = '“”‘’«»„—'
+# A double quote at the start of the text or after a space or an opening bracket
+_OPENING_QUOTE = re.compile(r'(?<![^\s(\[{<])"')
+
+
+def tokenize(text):
+    # "don't" -> "do n't", as nltk does
+    text = text.replace("n't", " n't").replace("N'T", " N'T")
+    if not text.isascii():
+        for char in _SPACED_OUT:
+            if char in text:
+                text = text.replace(char, f' {char} ')
+    if '"' in text:
+        # nltk writes double quotes as `` and ''
+        text = _OPENING_QUOTE.sub(' `` ', text).replace('"', " '' ")
+    return TOKEN_RE.findall(text)
+
+
+def intern_tokens(tokens):
+    """Map ``tokens`` to an int64 id array plus the list of distinct tokens (the vocabulary)."""
+    # dict.fromkeys keeps first-occurrence order, so ids follow the text
+    index = dict.fromkeys(tokens)
+    for token_id, token in enumerate(index):
+        index[token] = token_id
+    ids = np.fromiter(map(index.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+    return ids, list(index)
+
+
+def count_ngrams(ids, n=2, vocab_size=None, exclude=None):
+    """Count the n-grams of an id array.
+
+    Returns ``(first_positions, counts)``: for every distinct n-gram, where it
+    first occurs in ``ids`` and how often it occurs. ``exclude`` is an optional
+    boolean mask over the vocabulary; n-grams containing an excluded token
+    are dropped.
+    """
+    if not 1 <= n <= 3:
+        raise ValueError("n must be 1, 2 or 3")
+    windows = len(ids) - n + 1
+    if windows <= 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    vocab_size = vocab_size or int(ids.max()) + 1
+
+    positions = np.arange(windows)
+    if exclude is not None:
+        blocked = exclude[ids]
+        keep = ~blocked[:windows]
+        for offset in range(1, n):
+            keep &= ~blocked[offset:offset + windows]
+        positions = positions[keep]
+        if len(positions) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+    if vocab_size ** n < 2 ** 63:
+        # Pack the n ids into one int64 key
+        keys = ids[positions]
+        for offset in range(1, n):
+            keys = keys * vocab_size + ids[positions + offset]
+        _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    else:
+        rows = np.stack([ids[positions + offset] for offset in range(n)], axis=1)
+        _, first, counts = np.unique(rows, axis=0, return_index=True, return_counts=True)
+    return positions[first], counts
+
+
+def top_ngrams(text, n=2, k=10, stopwords=None):
+    """Return the ``k`` most common n-grams of ``text`` as ``[(tuple, count), ...]``.
+
+    ``text`` may be a string or an already tokenized list. With ``stopwords``
+    (a set of lowercase words, e.g. ``STOPWORDS``) n-grams containing one of
+    them are skipped.
+    """
+    tokens = tokenize(text) if isinstance(text, str) else list(text)
+    ids, vocab = intern_tokens(tokens)
+    exclude = None
+    if stopwords:
+        exclude = np.fromiter((token.lower() in stopwords for token in vocab), dtype=bool, count=len(vocab))
+    first, counts = count_ngrams(ids, n, len(vocab), exclude)
+    if len(counts) == 0:
+        return []
+
+    if len(counts) > k:
+        # Only n-grams at least as frequent as the k-th best can make the cut
+        threshold = np.partition(counts, len(counts) - k)[len(counts) - k]
+        candidates = np.nonzero(counts >= threshold)[0]
+    else:
+        candidates = np.arange(len(counts))
+    order = candidates[np.lexsort((first[candidates], -counts[candidates]))][:k]
+
+    return [
+        (tuple(vocab[token_id] for token_id in ids[first[i]:first[i] + n]), int(counts[i]))
+        for i in order
+    ]
@@ -0,0 +1,198 @@
+"""Process-wide TTL + LRU cache for fetched pages.
+
+Streamlit imports this module once per server process, so every session
+shares ``page_cache``. Entries honor ``Cache-Control`` and are revalidated
+with ``If-None-Match`` / ``If-Modified-Since`` once they go stale.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from metrics import stage
+
+
+# Defaults used when the server does not say how long a page stays fresh
+DEFAULT_TTL = 60
+MAX_ENTRIES = 256
+MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class CachedPage:
+    url: str
+    status_code: int
+    headers: dict
+    body: bytes
+    encoding: str = None
+    stored_at: float = field(default_factory=time.time)
+    expires_at: float = 0.0
+
+    @property
+    def text(self):
+        from charset import decode
+        return decode(self.body, self.encoding)
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    @property
+    def etag(self):
+        return self.headers.get('ETag')
+
+    @property
+    def last_modified(self):
+        return self.headers.get('Last-Modified')
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.expires_at
+
+
+def parse_cache_control(value):
+    """Split a ``Cache-Control`` header into a ``{directive: value}`` dict."""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers, default_ttl=DEFAULT_TTL):
+    """Seconds a response may be served without revalidation, ``None`` if it must not be stored."""
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives or 'private' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    max_age = directives.get('s-maxage') or directives.get('max-age')
+    if max_age is not None and re.fullmatch(r'\d+', max_age):
+        return int(max_age)
+    return default_ttl
+
+
+class PageCache:
+    """Thread-safe LRU cache bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'evictions': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def bytes_used(self):
+        return self._bytes
+
+    def get(self, url):
+        """Return the entry for ``url`` (fresh or stale) and mark it recently used."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, entry):
+        with self._lock:
+            old = self._entries.pop(entry.url, None)
+            if old is not None:
+                self._bytes -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[entry.url] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.stats['evictions'] += 1
+
+    def discard(self, url):
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def fetch(self, url, get=None):
+        """Return a ``CachedPage`` for ``url``, going to the network only when needed.
+
+        ``get`` is called like ``requests.get`` and must return a response object;
+        it defaults to the shared asynchronous engine in ``fetch_engine``.
+        """
+        with stage('fetch') as record:
+            entry, record.cache = self._fetch(url, get)
+            record.bytes = entry.size
+            return entry
+
+    def _fetch(self, url, get):
+        # Imported here so reading the cache stats does not load requests
+        import fetch_engine
+        from requests.structures import CaseInsensitiveDict
+
+        get = get or fetch_engine.fetch
+        entry = self.get(url)
+        now = time.time()
+        if entry is not None and entry.is_fresh(now):
+            self._count('hits')
+            return entry, 'hit'
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        response = get(url, headers=headers)
+
+        if entry is not None and response.status_code == 304:
+            # Not modified: keep the stored body, refresh headers and lifetime
+            self._count('revalidated')
+            merged = CaseInsensitiveDict(entry.headers)
+            merged.update(response.headers)
+            lifetime = freshness_lifetime(merged, self.default_ttl)
+            entry = CachedPage(entry.url, entry.status_code, merged, entry.body, entry.encoding,
+                               expires_at=now + (lifetime or 0))
+            if lifetime is None:
+                self.discard(url)
+            else:
+                self.put(entry)
+            return entry, 'revalidated'
+
+        from charset import resolve_encoding
+
+        self._count('misses')
+        entry = CachedPage(
+            url=url,
+            status_code=response.status_code,
+            headers=CaseInsensitiveDict(response.headers),
+            body=response.content,
+            # Not response.encoding: requests assumes ISO-8859-1 when the header has no charset
+            encoding=resolve_encoding(response.content, response.headers.get('Content-Type')),
+        )
+        lifetime = freshness_lifetime(entry.headers, self.default_ttl)
+        if response.status_code == 200 and lifetime is not None:
+            entry.expires_at = now + lifetime
+            self.put(entry)
+        else:
+            self.discard(url)
+        return entry, 'miss'
+
+
+# Shared by every session in this process
+page_cache = PageCache()
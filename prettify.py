@@ -0,0 +1,147 @@
+"""Indented view of a page's HTML, generated on demand as a stream of lines.
+
+Nothing in the analysis reads this output: it exists for the "HTML
+Structure" viewer and ``secode_cli.py prettify``. ``pretty_lines`` tokenizes
+the source in chunks with the standard library parser and yields each line
+as soon as it is complete, so neither a parse tree nor one large formatted
+string is held. ``prettified`` keeps the lines of recently viewed pages,
+keyed by content hash.
+"""
+import threading
+from collections import OrderedDict
+from html import escape
+from html.parser import HTMLParser
+
+from metrics import stage
+
+INDENT = " "
+CHUNK_SIZE = 64 * 1024
+# Characters of formatted lines kept across all cached pages
+MAX_CACHED_CHARS = 32 * 1024 * 1024
+
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+                       'source', 'track', 'wbr'])
+# Elements whose contents are shown line for line instead of reflowed
+VERBATIM_TAGS = frozenset(['script', 'style', 'pre', 'textarea'])
+# Elements whose end tag is optional: a new one closes the previous sibling
+SELF_CLOSING_SIBLINGS = frozenset(['li', 'p', 'option', 'tr', 'td', 'th', 'dt', 'dd'])
+
+
+class _LinePrinter(HTMLParser):
+    """Turns parser events into indented lines, one tag or text run per line."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self.open_tags = []
+        # Text arrives in pieces (chunk boundaries, entities); it is laid out once complete
+        self.text = []
+
+    def _emit(self, text):
+        if self.text:
+            self._flush_text()
+        indent = INDENT * len(self.open_tags)
+        self.lines.extend(indent + line for line in text.split('\n'))
+
+    def _tag_text(self):
+        text = self.get_starttag_text()
+        # Attribute values may span lines
+        return ' '.join(text.split()) if '\n' in text else text
+
+    def _flush_text(self):
+        data = ''.join(self.text)
+        self.text = []
+        if self.open_tags and self.open_tags[-1] in VERBATIM_TAGS:
+            lines = [line.rstrip() for line in data.strip('\n').split('\n')]
+            if any(lines):
+                self._emit('\n'.join(lines))
+            return
+        text = ' '.join(data.split())
+        if text:
+            self._emit(escape(text, quote=False))
+
+    def take(self):
+        lines, self.lines = self.lines, []
+        return lines
+
+    def close(self):
+        super().close()
+        if self.text:
+            self._flush_text()
+
+    def handle_starttag(self, tag, attrs):
+        if self.text:
+            self._flush_text()
+        if tag in SELF_CLOSING_SIBLINGS and self.open_tags and self.open_tags[-1] == tag:
+            self.open_tags.pop()
+        self._emit(self._tag_text())
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._emit(self._tag_text())
+
+    def handle_endtag(self, tag):
+        if self.text:
+            self._flush_text()
+        if tag in self.open_tags:
+            # Elements left open inside this one (e.g. <li> without </li>) close with it
+            while self.open_tags.pop() != tag:
+                pass
+        self._emit(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+    def handle_comment(self, data):
+        self._emit(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self._emit(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        self._emit(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        self._emit(f"<![{data}]>")
+
+
+def pretty_lines(html, chunk_size=CHUNK_SIZE):
+    """Yield the lines of ``html`` re-indented by nesting depth, without the trailing newlines."""
+    printer = _LinePrinter()
+    for start in range(0, len(html), chunk_size):
+        printer.feed(html[start:start + chunk_size])
+        yield from printer.take()
+    printer.close()
+    yield from printer.take()
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cached_chars = 0
+
+
+def prettified(content_hash, html):
+    """The lines of ``pretty_lines(html)`` as a list, cached under ``content_hash``."""
+    global _cached_chars
+
+    with stage('prettify') as record:
+        with _cache_lock:
+            entry = _cache.get(content_hash)
+            if entry is not None:
+                _cache.move_to_end(content_hash)
+        record.cache = 'miss' if entry is None else 'hit'
+        if entry is not None:
+            return entry[0]
+
+        record.bytes = len(html)
+        lines = list(pretty_lines(html))
+        size = sum(map(len, lines))
+        with _cache_lock:
+            if content_hash not in _cache:
+                _cache[content_hash] = (lines, size)
+                _cached_chars += size
+            while _cached_chars > MAX_CACHED_CHARS and len(_cache) > 1:
+                _, (_, evicted) = _cache.popitem(last=False)
+                _cached_chars -= evicted
+        return lines
@@ -1,14 +1,19 @@
-import matplotlib.pyplot as plt
-from bs4 import BeautifulSoup
 import streamlit as st
 from streamlit_option_menu import option_menu
-import pandas as pd
-import nltk
-from collections import Counter
-import requests
-import re
 import io
-import textwrap
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+# Only light modules are imported up front. matplotlib, pandas, numpy, the HTML
+# parsers and requests are imported by the tab or stage that needs them, so
+# the Learn/Practice/Resources tabs never pay for them (see check_imports.py).
+from analysis import analyze, analyze_streaming, flight_stats, memo_stats, normalize_url
+from page_cache import page_cache
+from store import result_store
+from monitor import DEFAULT_INTERVAL, ensure_monitor
+from metrics import serve_from_env, trace
+from code_pages import MAX_PAGE_CHARS, MAX_SEARCH_HITS, PAGE_SIZES, CodePages, LinePages
 
 
 
@@ -33,154 +38,239 @@ st.markdown(title_html, unsafe_allow_html=True)
 # URL input bar
 url_input = st.text_input("Enter domain (e.g., synology.com):")
 
+# Analysis results survive reruns, keyed by normalized URL; only the most recently
+# used are kept, since each holds its page source (older ones reopen from the store)
+MAX_SESSION_ANALYSES = 5
+if not isinstance(st.session_state.get("analyses"), OrderedDict):
+    # Also converts the plain dict of sessions started before the limit
+    st.session_state.analyses = OrderedDict(st.session_state.get("analyses", {}))
+
+
+def remember(url, result):
+    analyses = st.session_state.analyses
+    analyses[url] = result
+    analyses.move_to_end(url)
+    while len(analyses) > MAX_SESSION_ANALYSES:
+        analyses.popitem(last=False)
+
+
 # Preprocess the input URL
 if url_input.strip() != "":
-    if not re.match(r"^https?://", url_input):
-        url_input = "https://" + url_input
-
-if st.button("Analyze"):
-    
-    # Fetch HTML content from the URL
-    response = requests.get(url_input)
-    if response.status_code == 200:
-        html_content = response.text
-        # Parse HTML content
-        soup = BeautifulSoup(html_content, 'html.parser')
-        # Extract HTML, CSS, and JavaScript code
-        html_code = soup.prettify()
-        css_code = "\n".join([style.string or "" for style in soup.find_all('style')])
-        js_code = "\n".join([script.string or "" for script in soup.find_all('script')])
-        # Extract domain name
-        domain_name = re.search(r"https?://(?:www\.)?(.*?)\.", url_input).group(1)
-
-        about_us = soup.find('meta', attrs={'name': 'description'})
-        about_us_content = about_us.get('content') if about_us else None
+    url_input = normalize_url(url_input)
+
+# Streaming mode analyzes large pages while they download, without keeping the source
+stream_mode = st.checkbox("Analyze while downloading (large pages)")
+# Fetch linked stylesheets and scripts so the HTML/CSS/JS weights use real bytes
+assets_mode = st.checkbox("Include external CSS/JS files")
+
+# Prometheus metrics at http://127.0.0.1:$SECODE_METRICS_PORT/metrics when the variable is set
+serve_from_env()
 
+if st.button("Analyze") and url_input.strip() != "":
+    # Fetch and analyze the page once; tab switches reuse the stored result
+    if stream_mode:
+        progress = st.empty()
+
+        def show_progress(partial):
+            progress.info(f"Received {partial.bytes_received / 1024:.0f} KB · "
+                          f"headers {partial.header_counts} · {len(partial.links)} links · "
+                          f"CSS {partial.css_size} / JS {partial.js_size} characters")
+
+        result = analyze_streaming(url_input, on_progress=show_progress, include_assets=assets_mode)
+        progress.empty()
+    else:
+        result = analyze(url_input, include_assets=assets_mode)
+    if result is not None:
+        remember(url_input, result)
+        # A result shared from another session's identical analysis is saved by that session
+        if not result.coalesced:
+            with trace(result.timings):
+                result_store.save(result)
+        if result.unchanged:
+            st.info("The page content has not changed since it was last analyzed; the earlier results were reused.")
     else:
         st.error("Failed to fetch content from the provided URL.")
-        html_code = css_code = js_code = domain_name = None
-else:
-    html_code = css_code = js_code = domain_name = None
+        st.session_state.analyses.pop(url_input, None)
+
+result = st.session_state.analyses.get(url_input)
+if result is None and url_input.strip() != "":
+    # Reopen the last stored analysis of this URL without refetching it
+    result = result_store.latest(url_input)
+if result is not None:
+    remember(url_input, result)
+if result is not None and result.html_code is None:
+    st.caption(f"Analysis from {time.strftime('%Y-%m-%d %H:%M', time.localtime(result.fetched_at))}. "
+               "Click Analyze to refresh it.")
+
+if result is not None and result.timings:
+    with st.expander("Performance"):
+        st.table([
+            {'Stage': timing.stage, 'ms': round(timing.seconds * 1000, 1),
+             'KB': None if timing.bytes is None else round(timing.bytes / 1024, 1), 'Cache': timing.cache or ""}
+            for timing in result.timings
+        ])
+        st.write(f"Total: {sum(timing.seconds for timing in result.timings) * 1000:.0f} ms")
+
+# Shared page cache counters
+with st.sidebar.expander("Page cache"):
+    st.write(f"Hits: {page_cache.stats['hits']} · Revalidated: {page_cache.stats['revalidated']} · "
+             f"Misses: {page_cache.stats['misses']} · Evictions: {page_cache.stats['evictions']}")
+    st.write(f"{len(page_cache)} pages, {page_cache.bytes_used / 1024:.0f} KB cached")
+    st.write(f"Unchanged pages reused: {memo_stats['exact']} identical, {memo_stats['normalized']} "
+             f"same apart from comments/nonces/CSRF tokens · Re-analyzed: {memo_stats['misses']}")
+    st.write(f"Duplicate analyses shared with another session: {flight_stats['coalesced']}")
+
+# Earlier analyses of the same site, for comparison
+if result is not None:
+    with st.sidebar.expander("History"):
+        for past in result_store.history(domain=urlsplit(result.url).hostname, limit=10):
+            sizes = past['tech_sizes']
+            st.write(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(past['fetched_at']))} · "
+                     f"{sum(past['header_counts'].values())} headers · {len(past['links'])} links · "
+                     f"HTML/CSS/JS {sizes['html']}/{sizes['css']}/{sizes['js']}")
+
+# Watched domains are re-analyzed by a background thread; the app only reads the stored results
+monitor = ensure_monitor()
+with st.sidebar.expander("Watchlist"):
+    watched = {entry['url'] for entry in result_store.watchlist()}
+    if url_input.strip() != "":
+        if url_input in watched:
+            if st.button("Stop watching this URL"):
+                result_store.unwatch(url_input)
+        else:
+            hours = st.number_input("Re-analyze every (hours)", min_value=1, value=DEFAULT_INTERVAL // 3600)
+            if st.button("Watch this URL"):
+                result_store.watch(url_input, hours * 3600)
+                monitor.wake()
+    for entry in result_store.watchlist():
+        last_run = (time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_run']))
+                    if entry['last_run'] else "not yet")
+        st.write(f"{entry['url']} · every {entry['interval'] / 3600:g} h · last run {last_run}"
+                 f"{' · ' + entry['last_error'] if entry['last_error'] else ''}")
 
 # Menu
 selected = option_menu(
     menu_title=None,
-    options=["Technology", "Analysis", "Learn", "Practice", "Resources"],
-    icons=["code-slash", "bar-chart", "lightbulb", "braces", "search"],
+    options=["Technology", "Analysis", "Bulk", "Crawl", "Learn", "Practice", "Resources"],
+    icons=["code-slash", "bar-chart", "list-task", "diagram-3", "lightbulb", "braces", "search"],
     menu_icon="cast",
     default_index=0,
     orientation="horizontal",
 )
 
+def _go_to_line(line_key, line):
+    st.session_state[line_key] = line
+
+
+def _move_lines(line_key, delta, total):
+    line = st.session_state[line_key] + delta
+    if line <= total:
+        st.session_state[line_key] = max(1, line)
+
+
+def _go_to_first_hit(line_key, pages, query_key):
+    hits = pages.search(st.session_state[query_key], limit=1)
+    if hits:
+        st.session_state[line_key] = hits[0]
+
+
+def _go_to_hit(line_key, hit_key):
+    st.session_state[line_key] = st.session_state[hit_key]
+
+
+def code_viewer(source, language, key, file_name):
+    """Show ``source`` (a text or a list of lines) one page of lines at a time.
+
+    The full source never leaves the server except through the Download
+    button, which serves exactly what is shown. A list of lines is only
+    encoded into a file when "Prepare download" is clicked, and not kept.
+    """
+    pages = st.session_state.get(key + "_pages")
+    if pages is None or pages.source is not source:
+        pages = st.session_state[key + "_pages"] = (
+            LinePages(source) if isinstance(source, list) else CodePages(source))
+    total = pages.line_count
+    if total == 0:
+        st.write("None found.")
+        return
+    line_key, query_key = key + "_line", key + "_query"
+    if st.session_state.get(line_key, total + 1) > total:
+        st.session_state[line_key] = 1
+
+    size_col, line_col, search_col = st.columns([1, 1, 2])
+    page_size = size_col.selectbox("Lines per page", PAGE_SIZES, index=1, key=key + "_size")
+    first = line_col.number_input(f"Go to line (of {total})", min_value=1, max_value=total, step=1, key=line_key)
+    query = search_col.text_input("Search", key=query_key, on_change=_go_to_first_hit,
+                                  args=(line_key, pages, query_key))
+    if query:
+        hits = pages.search(query)
+        if hits:
+            more = "+" if len(hits) == MAX_SEARCH_HITS else ""
+            st.selectbox(f"{len(hits)}{more} matching lines", hits, key=key + "_hit", on_change=_go_to_hit,
+                         args=(line_key, key + "_hit"))
+        else:
+            st.write("No matches.")
+
+    last = min(total, first + page_size - 1)
+    window = pages.lines(first, page_size)
+    if len(window) > MAX_PAGE_CHARS:
+        window = window[:MAX_PAGE_CHARS]
+        st.caption(f"Showing the first {MAX_PAGE_CHARS:,} characters of this page; download the file for all of it.")
+    st.code(window, language=language)
+    previous_col, next_col, caption_col, download_col = st.columns([1, 1, 3, 2])
+    previous_col.button("Previous", key=key + "_previous", on_click=_move_lines, args=(line_key, -page_size, total))
+    next_col.button("Next", key=key + "_next", on_click=_move_lines, args=(line_key, page_size, total))
+    caption_col.caption(f"Lines {first}–{last} of {total}")
+    if not isinstance(source, list):
+        download_col.download_button("Download", data=source, file_name=file_name, key=key + "_download")
+    elif download_col.button("Prepare download", key=key + "_prepare"):
+        lines = io.BytesIO()
+        lines.writelines(line.encode('utf-8') + b'\n' for line in source)
+        download_col.download_button("Download", data=lines.getvalue(), file_name=file_name, key=key + "_download")
+
+
 # Display selected tab content
 if selected == "Technology":
-    if html_code is not None:
+    if result is not None and result.html_code is None:
+        st.info("The page source was not kept for this analysis (streamed or reopened from history). "
+                "Click Analyze to fetch it again.")
+    elif result is not None:
+        # Long sources are paged so the browser only ever receives one window of lines
         with st.expander("HTML Structure"):
-            st.code(html_code, language='html')
+            # The indented view is only built when asked for, and then kept per page content
+            if st.checkbox("Indent by nesting", key="html_pretty"):
+                from prettify import prettified
+
+                code_viewer(prettified(result.content_hash, result.html_code), 'html', "html_pretty_code",
+                            "page-indented.html")
+            else:
+                code_viewer(result.html_code, 'html', "html_code", "page.html")
         with st.expander("CSS Styles"):
-            st.code(css_code, language='css')
+            code_viewer(result.css_code, 'css', "css_code", "styles.css")
         with st.expander("Javascript Code"):
-            st.code(js_code, language='javascript')
+            code_viewer(result.js_code, 'javascript', "js_code", "scripts.js")
     else:
         st.warning("Click Analyze button to fetch content.")
+    if result is not None and result.assets is not None:
+        with st.expander(f"External CSS/JS files ({len(result.assets)})"):
+            html_bytes, css_bytes, js_bytes = result.tech_sizes
+            st.write(f"HTML {html_bytes / 1024:.0f} KB · CSS {css_bytes / 1024:.0f} KB · "
+                     f"JavaScript {js_bytes / 1024:.0f} KB")
+            st.table([
+                {'Type': asset.kind.upper(), 'URL': asset.url, 'KB': round(asset.size / 1024, 1),
+                 'Status': asset.error or ("cached" if asset.reused else "fetched")}
+                for asset in result.assets
+            ])
 
 
 
 
 if selected == "Analysis":
-    if html_code is not None:
-        # Parse HTML content
-        soup = BeautifulSoup(html_code, 'html.parser')
-
-        # Find all header tags
-        header_tags = soup.find_all(re.compile('^h[1-6]$'))
-        # Count occurrences of each header tag
-        header_counts = {}
-        for tag in header_tags:
-            tag_name = tag.name
-            if tag_name in header_counts:
-                header_counts[tag_name] += 1
-            else:
-                header_counts[tag_name] = 1
-
-        # Calculate percentage of each technology
-        total_length = len(html_code) + len(css_code) + len(js_code)
-        html_percent = len(html_code) / total_length * 100
-        css_percent = len(css_code) / total_length * 100
-        js_percent = len(js_code) / total_length * 100
-
-        # Extract bi-grams
-        text = soup.get_text()
-        tokens = nltk.word_tokenize(text)
-        bi_grams = list(nltk.bigrams(tokens))
-        bi_gram_counts = Counter(bi_grams)
-
-        # Extract links with 'https://'
-        links_with_https = [link['href'] for link in soup.find_all('a', href=True) if link['href'].startswith('https://')]
-
-        # Limit bi-grams and links to 10
-        top_bi_grams = bi_gram_counts.most_common(10)
-        top_links = links_with_https[:7]
+    if result is not None:
+        from charts import render_analysis_png
 
         # Create a single image containing all the analysis results
-        fig, axes = plt.subplots(2, 2, figsize=(12, 8))  # Adjust the figure size here
-
-        # Header tags bar graph
-        if header_counts:
-            labels = list(header_counts.keys())
-            counts = list(header_counts.values())
-            axes[0, 0].bar(labels, counts, color='skyblue')
-            axes[0, 0].set_xlabel('Header Tags')
-            axes[0, 0].set_ylabel('Count')
-            axes[0, 0].set_xticklabels(labels, rotation=45)
-            axes[0, 0].set_title('Header Tags Analysis')
-            axes[0, 0].margins(0.2)  # Add more margin to the graph
-
-        # Technology pie chart
-        labels = ['HTML', 'CSS', 'JavaScript']
-        sizes = [html_percent, css_percent, js_percent]
-        explode = (0.1, 0.1, 0.1)  # explode 1st slice
-        axes[0, 1].pie(sizes, explode=explode, labels=labels, autopct='%1.1f%%', shadow=True, startangle=140)
-        axes[0, 1].axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-        axes[0, 1].set_title('Technology Analysis')
-        axes[0, 1].margins(0.2)  # Add more margin to the graph
-
-        # Top bi-grams bar graph
-        bi_gram_labels = [str(gram) for gram, count in top_bi_grams]
-        bi_gram_counts = [count for gram, count in top_bi_grams]
-        axes[1, 0].barh(bi_gram_labels[::-1], bi_gram_counts[::-1], color='lightgreen')  # Reversed to display most common bi-grams at the top
-        axes[1, 0].set_xlabel('Count')
-        axes[1, 0].set_ylabel('Bi-gram')
-        axes[1, 0].set_title('Top Bi-grams')
-        axes[1, 0].margins(0.2)  # Add more margin to the graph
-
-        # Top links table
-        axes[1, 1].axis('off')  # Hide axes for the table
-        table_data = [["Top Links:"]] + [[link] for link in top_links]
-        table = axes[1, 1].table(cellText=table_data, loc='center', cellLoc='center', colWidths=[0.5]*5)
-        table.auto_set_font_size(False)
-        table.set_fontsize(8)
-        table.scale(2, 2.1)
-
-        # Extract meta description
-        meta_description = soup.find('meta', attrs={'name': 'description'})
-        about_us_content = meta_description['content'] if meta_description else None
-
-        # Limit meta description to one sentence
-        if about_us_content:
-            sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?)\s', about_us_content)
-            about_us_content = sentences[0]
-
-        # Add title and paragraph
-        plt.figtext(0.02, 0.98, f"SEO Analysis on {url_input}", fontsize=14, fontweight='bold', color='black', ha ='left', va='top', backgroundcolor='white', alpha=0.5)
-        plt.figtext(0.02, 0.95, f"About {domain_name.capitalize()}:\n{about_us_content if about_us_content else 'No meta description available.'}", fontsize=10, color='black', ha ='left', va='top', backgroundcolor='white', alpha=0.5)
-
-        plt.tight_layout(rect=[0, 0.03, 1, 0.95])  # Adjust the top padding
-
-        # Save the composite image
-        img_data = io.BytesIO()
-        plt.savefig(img_data, format='png')
-        img_data.seek(0)
+        img_data = render_analysis_png(result)
 
         # Display the image
         st.image(img_data, use_column_width=True, )
@@ -188,6 +278,22 @@ if selected == "Analysis":
         # Add download button to download the image
         st.download_button(label="Download Image", data=img_data, file_name='analysis_results.png', mime='image/png')
 
+        # Every link of the page, resolved and de-duplicated
+        with st.expander(f"All links ({len(result.link_index)})"):
+            import pandas as pd
+            from links import check_links
+
+            internal = sum(link.internal for link in result.link_index)
+            nofollow = sum(link.nofollow for link in result.link_index)
+            st.write(f"{internal} internal · {len(result.link_index) - internal} external · {nofollow} nofollow")
+            if st.button("Check for broken links"):
+                check_links(result.link_index)
+            if result.link_index:
+                link_table = pd.DataFrame([link.to_dict() for link in result.link_index])
+                link_table['broken'] = [link.broken for link in result.link_index]
+                st.dataframe(link_table)
+                st.download_button(label="Download CSV", data=link_table.to_csv(index=False), file_name='links.csv', mime='text/csv')
+
     else:
         st.warning("Click Analyze button for analysis.")
 
@@ -197,6 +303,75 @@ if selected == "Analysis":
 
 
 
+elif selected == "Bulk":
+    import pandas as pd
+    from bulk import analyze_many, parse_domains
+
+    st.markdown("""
+        ## Bulk Analysis 📋
+         Analyze many domains at once and download the results.""")
+    domains_text = st.text_area("Domains (one per line):")
+    uploaded = st.file_uploader("Or upload a CSV/TXT list of domains", type=['csv', 'txt'])
+    if uploaded is not None:
+        domains_text += "\n" + uploaded.getvalue().decode('utf-8', errors='replace')
+
+    if st.button("Analyze all"):
+        urls = parse_domains(domains_text)
+        if urls:
+            progress = st.progress(0)
+            st.session_state.bulk_rows = analyze_many(urls, on_progress=lambda done, total: progress.progress(done / total))
+        else:
+            st.warning("Enter at least one domain.")
+
+    if st.session_state.get("bulk_rows"):
+        # Click a column header to sort
+        bulk_table = pd.DataFrame(st.session_state.bulk_rows)
+        st.dataframe(bulk_table)
+        st.download_button(label="Download CSV", data=bulk_table.to_csv(index=False), file_name='bulk_analysis.csv', mime='text/csv')
+        try:
+            parquet_data = io.BytesIO()
+            bulk_table.to_parquet(parquet_data, index=False)
+            st.download_button(label="Download Parquet", data=parquet_data.getvalue(), file_name='bulk_analysis.parquet', mime='application/octet-stream')
+        except ImportError:
+            st.caption("Install pyarrow to download Parquet.")
+
+elif selected == "Crawl":
+    import pandas as pd
+    from crawl import crawl
+
+    st.markdown("""
+        ## Site Crawl 🕸️
+         Follow the links of the entered domain and total the results across its pages.""")
+    max_pages = st.number_input("Maximum pages", min_value=1, max_value=5000, value=100)
+    max_depth = st.number_input("Maximum link depth", min_value=0, max_value=20, value=3)
+    time_budget = st.number_input("Time budget (seconds)", min_value=5, max_value=1800, value=120)
+
+    if st.button("Crawl site"):
+        if url_input.strip() != "":
+            progress = st.empty()
+
+            def show_crawl_progress(report, frontier_size):
+                progress.info(f"{len(report.pages)} pages crawled · {frontier_size} queued")
+
+            st.session_state.crawl_report = crawl(url_input, max_pages=max_pages, max_depth=max_depth,
+                                                  time_budget=time_budget, on_progress=show_crawl_progress)
+            progress.empty()
+        else:
+            st.warning("Enter a domain first.")
+
+    report = st.session_state.get("crawl_report")
+    if report is not None:
+        stopped = {'done': "every reachable page was crawled", 'pages': "page budget reached",
+                   'time': "time budget reached", 'cancelled': "cancelled"}[report.stopped_by]
+        st.write(f"{report.pages_crawled} pages of {report.start_url} in {report.elapsed:.1f} s ({stopped}). "
+                 f"Skipped: {report.skipped_robots} disallowed by robots.txt, {report.skipped_budget} over budget.")
+        st.write("Header tags across the site:", dict(sorted(report.header_counts.items())))
+        st.write("Top bi-grams across the site:",
+                 ", ".join(f"{' '.join(gram)} ({count})" for gram, count in report.top_bi_grams))
+        crawl_table = pd.DataFrame([page.__dict__ for page in report.pages])
+        st.dataframe(crawl_table)
+        st.download_button(label="Download CSV", data=crawl_table.to_csv(index=False), file_name='crawl.csv', mime='text/csv')
+
 elif selected == "Learn":
      st.markdown("""
         ## Welcome to the Learn Menu! 🎉
@@ -0,0 +1,289 @@
+"""Command line entry point for the SEO analysis pipeline (no Streamlit needed).
+
+Examples::
+
+    python secode_cli.py analyze synology.com example.com --format json --jobs 8
+    python secode_cli.py analyze --input domains.txt --chart charts/
+    python secode_cli.py history example.com
+    python secode_cli.py watch add example.com --every 6
+    python secode_cli.py monitor --workers 4
+    python secode_cli.py crawl example.com --max-pages 500 --max-depth 4
+    python secode_cli.py prettify example.com --output page.html
+
+Only the stages that are asked for are imported: matplotlib is loaded for
+``--chart`` alone, and Streamlit never is.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='secode', description="Headless SEO analysis of web pages.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help="fetch and analyze one or more URLs")
+    analyze.add_argument('urls', nargs='*', metavar='URL', help="domains or URLs to analyze")
+    analyze.add_argument('--input', metavar='FILE', help="read more domains from a TXT/CSV file ('-' for stdin)")
+    analyze.add_argument('--format', choices=['json', 'jsonl', 'text'], default='text', help="output format")
+    analyze.add_argument('--jobs', type=int, default=4, metavar='N', help="analyze N URLs concurrently")
+    analyze.add_argument('--parser', metavar='BACKEND', help="parser backend: auto, lxml, selectolax or html.parser")
+    analyze.add_argument('--stream', action='store_true', help="analyze while downloading (constant memory)")
+    analyze.add_argument('--assets', action='store_true', help="also fetch external CSS/JS and measure sizes in bytes")
+    analyze.add_argument('--check-links', action='store_true', help="HEAD-check every link and report broken ones")
+    analyze.add_argument('--chart', metavar='DIR', help="also write the Analysis figure as DIR/<host>-<hash>.png")
+    analyze.add_argument('--timings', action='store_true', help="log a JSON line per pipeline stage to stderr")
+    analyze.add_argument('--no-save', action='store_true', help="do not record the results in the history database")
+
+    history = commands.add_parser('history', help="list stored analyses, newest first")
+    history.add_argument('domain', nargs='?', help="only show this domain (host name)")
+    history.add_argument('--limit', type=int, default=20, metavar='N', help="show at most N analyses")
+    history.add_argument('--format', choices=['json', 'jsonl', 'text'], default='text', help="output format")
+
+    watch = commands.add_parser('watch', help="manage the watchlist of domains analyzed on a schedule")
+    watch.add_argument('action', choices=['add', 'remove', 'list'])
+    watch.add_argument('urls', nargs='*', metavar='URL', help="domains or URLs to add or remove")
+    watch.add_argument('--every', type=float, default=6, metavar='HOURS', help="hours between analyses (default 6)")
+
+    crawl = commands.add_parser('crawl', help="crawl one site and total its header tags and bi-grams")
+    crawl.add_argument('url', metavar='URL', help="domain or URL to start from")
+    crawl.add_argument('--max-pages', type=int, default=200, metavar='N', help="crawl at most N pages")
+    crawl.add_argument('--max-depth', type=int, default=3, metavar='N', help="follow links at most N clicks deep")
+    crawl.add_argument('--time-budget', type=float, default=120, metavar='SECONDS', help="stop after this long")
+    crawl.add_argument('--jobs', type=int, default=8, metavar='N', help="fetch N pages concurrently")
+    crawl.add_argument('--ignore-robots', action='store_true', help="do not honour robots.txt")
+    crawl.add_argument('--format', choices=['json', 'text'], default='text', help="output format")
+
+    prettify = commands.add_parser('prettify', help="write the HTML of a page indented by nesting depth")
+    prettify.add_argument('url', metavar='URL', help="domain or URL to fetch")
+    prettify.add_argument('--output', '-o', metavar='FILE', help="write to FILE instead of stdout")
+
+    monitor = commands.add_parser('monitor', help="analyze due watchlist domains until interrupted")
+    monitor.add_argument('--workers', type=int, default=4, metavar='N', help="analyze up to N domains at once")
+    monitor.add_argument('--metrics-port', type=int, metavar='PORT', help="serve Prometheus metrics on PORT")
+    return parser
+
+
+def read_urls(args):
+    from bulk import parse_domains
+
+    text = "\n".join(args.urls)
+    if args.input:
+        if args.input == '-':
+            text += "\n" + sys.stdin.read()
+        else:
+            with open(args.input, encoding='utf-8', errors='replace') as handle:
+                text += "\n" + handle.read()
+    return parse_domains(text)
+
+
+def chart_file_name(url):
+    """``<host>-<hash>.png``: the host of ``url`` made safe for a file name, and a short hash of ``url``.
+
+    The hash keeps the charts of pages on one host, or on one host's different ports, apart.
+    """
+    host = re.sub(r'[^A-Za-z0-9.-]+', '_', urlsplit(url).hostname or 'page').strip('.') or 'page'
+    return f"{host}-{hashlib.sha256(url.encode('utf-8')).hexdigest()[:8]}.png"
+
+
+def run_analyze(args):
+    import analysis
+    import extract
+
+    if args.parser:
+        extract.get_backend(args.parser)  # fail early on a bad name
+        extract.PARSER = args.parser
+    if args.timings:
+        import logging
+        logging.basicConfig(format='%(message)s')
+        logging.getLogger('secode.metrics').setLevel(logging.INFO)
+
+    urls = read_urls(args)
+    if not urls:
+        print("secode: no URLs given", file=sys.stderr)
+        return 2
+
+    analyze_one = analysis.analyze_streaming if args.stream else analysis.analyze
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(lambda url: analyze_one(url, include_assets=args.assets), urls))
+
+    if args.check_links:
+        from links import check_links
+
+        for result in results:
+            if result is not None:
+                check_links(result.link_index)
+
+    # Saved first, so a chart that cannot be written does not lose the results
+    if not args.no_save:
+        from store import result_store
+
+        for result in results:
+            if result is not None and not result.coalesced:
+                result_store.save(result)
+
+    if args.chart:
+        from charts import render_analysis_png
+
+        os.makedirs(args.chart, exist_ok=True)
+        for result in results:
+            if result is not None:
+                path = os.path.join(args.chart, chart_file_name(result.url))
+                with open(path, 'wb') as handle:
+                    handle.write(render_analysis_png(result))
+
+    records = [
+        result.to_dict() if result is not None else {'url': url, 'error': "Failed to fetch content"}
+        for url, result in zip(urls, results)
+    ]
+    if args.format == 'json':
+        json.dump(records, sys.stdout, indent=2)
+        print()
+    elif args.format == 'jsonl':
+        for record in records:
+            print(json.dumps(record))
+    else:
+        for record, result in zip(records, results):
+            if 'error' in record:
+                print(f"{record['url']}: {record['error']}")
+                continue
+            percentages = record['tech_percentages']
+            print(record['url'])
+            print(f"  headers: {record['header_counts']}")
+            print(f"  links: {len(record['links'])}  "
+                  f"html/css/js: {percentages['html']:.1f}% / {percentages['css']:.1f}% / {percentages['js']:.1f}%")
+            print(f"  top bi-grams: {', '.join(' '.join(gram) for gram, _ in record['top_bi_grams'][:5])}")
+            for link in result.link_index:
+                if link.broken:
+                    print(f"  broken link: {link.url} ({link.status or link.error})")
+    return 1 if any(result is None for result in results) else 0
+
+
+def run_history(args):
+    import time
+
+    from store import result_store
+
+    records = result_store.history(domain=args.domain, limit=args.limit)
+    if args.format == 'json':
+        json.dump(records, sys.stdout, indent=2)
+        print()
+    elif args.format == 'jsonl':
+        for record in records:
+            print(json.dumps(record))
+    else:
+        for record in records:
+            sizes = record['tech_sizes']
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(record['fetched_at']))}  {record['url']}  "
+                  f"headers {sum(record['header_counts'].values())}  links {len(record['links'])}  "
+                  f"html/css/js {sizes['html']}/{sizes['css']}/{sizes['js']}")
+    return 0
+
+
+def run_watch(args):
+    import time
+
+    from analysis import normalize_url
+    from store import result_store
+
+    if args.action == 'list':
+        for entry in result_store.watchlist():
+            last_run = entry['last_run'] and time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_run']))
+            print(f"{entry['url']}  every {entry['interval'] / 3600:g} h  last run {last_run or 'never'}"
+                  f"{'  (' + entry['last_error'] + ')' if entry['last_error'] else ''}")
+        return 0
+    if not args.urls:
+        print("secode: no URLs given", file=sys.stderr)
+        return 2
+    for url in args.urls:
+        if args.action == 'add':
+            result_store.watch(normalize_url(url), args.every * 3600)
+        else:
+            result_store.unwatch(normalize_url(url))
+    return 0
+
+
+def run_crawl(args):
+    from crawl import crawl
+
+    report = crawl(args.url, max_pages=args.max_pages, max_depth=args.max_depth, time_budget=args.time_budget,
+                   workers=max(1, args.jobs), respect_robots=not args.ignore_robots)
+    if args.format == 'json':
+        json.dump(report.to_dict(), sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{report.start_url}: {report.pages_crawled} pages in {report.elapsed:.1f} s (stopped by {report.stopped_by})")
+        print(f"  skipped: {report.skipped_robots} by robots.txt, {report.skipped_budget} over budget")
+        print(f"  headers: {dict(sorted(report.header_counts.items()))}")
+        print(f"  top bi-grams: {', '.join(' '.join(gram) for gram, _ in report.top_bi_grams[:5])}")
+    return 0 if report.pages_crawled else 1
+
+
+def run_prettify(args):
+    import requests
+
+    from analysis import normalize_url
+    from page_cache import page_cache
+    from prettify import pretty_lines
+
+    url = normalize_url(args.url)
+    try:
+        page = page_cache.fetch(url)
+    except requests.RequestException as exc:
+        print(f"secode: {url}: {exc}", file=sys.stderr)
+        return 1
+    if page.status_code != 200:
+        print(f"secode: {url}: HTTP {page.status_code}", file=sys.stderr)
+        return 1
+    # Lines are written as they are produced; the indented page is never held whole
+    handle = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for line in pretty_lines(page.text):
+            handle.write(line + "\n")
+    finally:
+        if args.output:
+            handle.close()
+    return 0
+
+
+def run_monitor(args):
+    import logging
+
+    from monitor import Monitor
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.metrics_port:
+        import metrics
+        metrics.serve(args.metrics_port)
+    monitor = Monitor(workers=max(1, args.workers))
+    try:
+        monitor.run_forever()
+    except KeyboardInterrupt:
+        monitor.stop(wait=False)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'analyze':
+        return run_analyze(args)
+    if args.command == 'history':
+        return run_history(args)
+    if args.command == 'watch':
+        return run_watch(args)
+    if args.command == 'crawl':
+        return run_crawl(args)
+    if args.command == 'prettify':
+        return run_prettify(args)
+    if args.command == 'monitor':
+        return run_monitor(args)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""Persistent history of analyses (and the monitoring watchlist) in a local SQLite database.
+
+Every analysis is appended as one row (URL, fetch time, header counts,
+links, bi-gram counts, tech sizes and the key of its chart), so a past
+result can be reopened without refetching the page and compared with
+earlier runs. The database runs in WAL mode, so the app, the CLI and
+background jobs can read while another process writes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+from analysis import build_result
+from assets import CACHE_DIR
+from extract import PageFacts
+from metrics import stage
+
+DB_PATH = os.environ.get('SECODE_DB', os.path.join(CACHE_DIR, 'analyses.sqlite3'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    header_counts TEXT NOT NULL,
+    links TEXT NOT NULL,
+    meta_description TEXT,
+    top_bi_grams TEXT NOT NULL,
+    html_size INTEGER NOT NULL,
+    css_size INTEGER NOT NULL,
+    js_size INTEGER NOT NULL,
+    -- True when the sizes are bytes including external CSS/JS files
+    with_assets INTEGER NOT NULL DEFAULT 0,
+    -- charts.chart_key: hash of the values the chart is drawn from, not of the PNG
+    chart_key TEXT,
+    -- fingerprint.exact_hash / normalized_hash of the fetched page, when known
+    content_sha256 TEXT,
+    normalized_sha256 TEXT,
+    -- JSON list of the nofollow/ugc/sponsored links, and the page's <base href>
+    nofollow_links TEXT,
+    base_href TEXT
+);
+CREATE INDEX IF NOT EXISTS analyses_domain_time ON analyses (domain, fetched_at);
+CREATE INDEX IF NOT EXISTS analyses_url_time ON analyses (url, fetched_at);
+CREATE INDEX IF NOT EXISTS analyses_time ON analyses (fetched_at);
+CREATE TABLE IF NOT EXISTS watchlist (
+    url TEXT PRIMARY KEY,
+    -- Seconds between two analyses
+    interval REAL NOT NULL,
+    next_run REAL NOT NULL,
+    last_run REAL,
+    last_error TEXT,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS watchlist_next_run ON watchlist (next_run);
+"""
+
+_COLUMNS = ('id, url, domain, fetched_at, header_counts, links, meta_description, top_bi_grams, '
+            'html_size, css_size, js_size, with_assets, chart_key, content_sha256, normalized_sha256, '
+            'nofollow_links, base_href')
+# Columns renamed or added after the first release, for older databases
+_RENAMED_COLUMNS = {'chart_sha256': 'chart_key'}
+_ADDED_COLUMNS = {'content_sha256': 'TEXT', 'normalized_sha256': 'TEXT', 'nofollow_links': 'TEXT',
+                  'base_href': 'TEXT'}
+
+
+def domain_of(url):
+    return (urlsplit(url).hostname or "").lower()
+
+
+class ResultStore:
+    """Append-only analysis history; safe to share between threads."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections are per thread; the database file is shared
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL makes NORMAL durable enough: a crash loses at most the last commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            existing = {row['name'] for row in connection.execute("PRAGMA table_info(analyses)")}
+            for old, new in _RENAMED_COLUMNS.items():
+                if old in existing and new not in existing:
+                    connection.execute(f"ALTER TABLE analyses RENAME COLUMN {old} TO {new}")
+                    existing.add(new)
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE analyses ADD COLUMN {column} {column_type}")
+            self._local.connection = connection
+        return connection
+
+    def save(self, result):
+        """Append ``result`` to the history and return its row id."""
+        from charts import chart_key
+
+        with stage('store'):
+            html_size, css_size, js_size = result.tech_sizes
+            connection = self._connection()
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO analyses (url, domain, fetched_at, header_counts, links, meta_description, "
+                    "top_bi_grams, html_size, css_size, js_size, with_assets, chart_key, content_sha256, "
+                    "normalized_sha256, nofollow_links, base_href) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        result.url,
+                        domain_of(result.url),
+                        result.fetched_at,
+                        json.dumps(result.header_counts),
+                        json.dumps(result.facts.links),
+                        result.facts.meta_description,
+                        json.dumps([[list(gram), count] for gram, count in result.top_bi_grams]),
+                        html_size,
+                        css_size,
+                        js_size,
+                        int(result.assets is not None),
+                        chart_key(result),
+                        result.content_hash,
+                        result.normalized_hash,
+                        json.dumps(result.facts.nofollow_links),
+                        result.facts.base_href,
+                    ),
+                )
+            return cursor.lastrowid
+
+    def latest(self, url):
+        """Most recent stored analysis of ``url`` as an ``AnalysisResult``, or ``None``."""
+        row = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM analyses WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)
+        ).fetchone()
+        return None if row is None else to_result(row)
+
+    def load(self, row_id):
+        row = self._connection().execute(f"SELECT {_COLUMNS} FROM analyses WHERE id = ?", (row_id,)).fetchone()
+        return None if row is None else to_result(row)
+
+    def history(self, domain=None, since=None, limit=100):
+        """Past analyses, newest first, as plain dicts (one per row).
+
+        ``domain`` restricts the rows to one host and ``since`` to fetch
+        times after that Unix timestamp.
+        """
+        conditions, params = [], []
+        if domain:
+            conditions.append("domain = ?")
+            params.append(domain.lower())
+        if since is not None:
+            conditions.append("fetched_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM analyses {where} ORDER BY fetched_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [to_dict(row) for row in rows]
+
+    def prune(self, older_than):
+        """Delete analyses fetched more than ``older_than`` seconds ago; returns the row count."""
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute("DELETE FROM analyses WHERE fetched_at < ?", (time.time() - older_than,))
+        return cursor.rowcount
+
+    def watch(self, url, interval):
+        """Add ``url`` to the watchlist (or change its interval); it is due right away."""
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO watchlist (url, interval, next_run, added_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET interval = excluded.interval, next_run = excluded.next_run",
+                (url, interval, time.time(), time.time()),
+            )
+
+    def unwatch(self, url):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM watchlist WHERE url = ?", (url,))
+
+    def watchlist(self):
+        rows = self._connection().execute(
+            "SELECT url, interval, next_run, last_run, last_error, added_at FROM watchlist ORDER BY url"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_due(self, limit, lease):
+        """Take up to ``limit`` due watchlist entries, as ``[(url, interval), ...]``.
+
+        Claimed entries are pushed ``lease`` seconds into the future in the
+        same transaction, so several monitor processes sharing the database
+        never analyze the same URL twice. ``finish_run`` sets the real next run.
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT url, interval FROM watchlist WHERE next_run <= ? ORDER BY next_run LIMIT ?", (now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE watchlist SET next_run = ? WHERE url = ?", [(now + lease, row['url']) for row in rows]
+            )
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        return [(row['url'], row['interval']) for row in rows]
+
+    def finish_run(self, url, next_run, error=None):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "UPDATE watchlist SET next_run = ?, last_run = ?, last_error = ? WHERE url = ?",
+                (next_run, time.time(), error, url),
+            )
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def to_dict(row):
+    return {
+        'id': row['id'],
+        'url': row['url'],
+        'domain': row['domain'],
+        'fetched_at': row['fetched_at'],
+        'header_counts': json.loads(row['header_counts']),
+        'links': json.loads(row['links']),
+        'meta_description': row['meta_description'],
+        'top_bi_grams': json.loads(row['top_bi_grams']),
+        'tech_sizes': {'html': row['html_size'], 'css': row['css_size'], 'js': row['js_size']},
+        'with_assets': bool(row['with_assets']),
+        'chart_key': row['chart_key'],
+        'content_sha256': row['content_sha256'],
+        'normalized_sha256': row['normalized_sha256'],
+        'nofollow_links': json.loads(row['nofollow_links'] or '[]'),
+        'base_href': row['base_href'],
+    }
+
+
+def to_result(row):
+    """Rebuild an ``AnalysisResult`` from a stored row (the page source is not stored)."""
+    facts = PageFacts(
+        header_counts=json.loads(row['header_counts']),
+        links=json.loads(row['links']),
+        meta_description=row['meta_description'],
+        # Rows saved before these columns existed have neither
+        nofollow_links=json.loads(row['nofollow_links'] or '[]'),
+        base_href=row['base_href'],
+    )
+    top_bi_grams = [(tuple(gram), count) for gram, count in json.loads(row['top_bi_grams'])]
+    result = build_result(row['url'], None, facts, top_bi_grams,
+                          (row['html_size'], row['css_size'], row['js_size']))
+    result.fetched_at = row['fetched_at']
+    result.content_hash = row['content_sha256']
+    result.normalized_hash = row['normalized_sha256']
+    return result
+
+
+result_store = ResultStore()
@@ -0,0 +1,204 @@
+"""Incremental page analysis that runs while the response downloads.
+
+``StreamingAnalyzer`` is an ``html.parser.HTMLParser`` fed with decoded
+chunks as they arrive. It keeps only running counters (headers, links,
+inline CSS/JS sizes, bi-grams) plus the text node being read, so memory
+does not grow with the size of the page and no DOM is ever built.
+"""
+import codecs
+from collections import Counter
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+import http_client
+from charset import META_SCAN_BYTES, resolve_encoding, strip_bom
+from extract import CODE_TAGS, HEADER_TAGS, HIDDEN_TAGS, INERT_TAGS, is_nofollow, is_stylesheet
+
+# How often (in received bytes) analyze_stream reports progress
+PROGRESS_EVERY = 256 * 1024
+
+
+@dataclass
+class PartialAnalysis:
+    bytes_received: int = 0
+    html_size: int = 0
+    css_size: int = 0
+    js_size: int = 0
+    header_counts: dict = field(default_factory=dict)
+    links: list = field(default_factory=list)
+    meta_description: str = None
+    stylesheet_urls: list = field(default_factory=list)
+    script_urls: list = field(default_factory=list)
+    nofollow_links: list = field(default_factory=list)
+    base_href: str = None
+    top_bi_grams: list = field(default_factory=list)
+    done: bool = False
+
+
+def _default_tokenize(text):
+    from ngrams import tokenize
+    return tokenize(text)
+
+
+class StreamingAnalyzer(HTMLParser):
+    """Feed HTML text in any number of chunks; read results with ``snapshot()``."""
+
+    def __init__(self, tokenize=None):
+        super().__init__(convert_charrefs=True)
+        self.tokenize = tokenize or _default_tokenize
+        self.header_counts = {}
+        self.links = []
+        self.meta_found = False
+        self.meta_description = None
+        self.stylesheet_urls = []
+        self.script_urls = []
+        self.nofollow_links = []
+        self.base_href = None
+        self.bi_gram_counts = Counter()
+        self.chars = 0
+        self.css_size = 0
+        self.js_size = 0
+        self._code_tag = None
+        # Open non-rendered elements by name; text inside them is skipped
+        self._hidden = dict.fromkeys(HIDDEN_TAGS - CODE_TAGS, 0)
+        self._text = []
+        self._last_token = None
+
+    def feed(self, data):
+        self.chars += len(data)
+        super().feed(data)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in self._hidden:
+            self._hidden[tag] += 1
+        if any(self._hidden[tag] for tag in INERT_TAGS):
+            # Inert content: nothing inside counts
+            return
+        if tag in HEADER_TAGS:
+            self.header_counts[tag] = self.header_counts.get(tag, 0) + 1
+        elif tag == 'a':
+            attrs = dict(attrs)
+            href = attrs.get('href', False)
+            if href is not False:
+                self.links.append(href or "")
+                if is_nofollow(attrs.get('rel')):
+                    self.nofollow_links.append(href or "")
+        elif tag in CODE_TAGS:
+            self._code_tag = tag
+            src = dict(attrs).get('src') if tag == 'script' else None
+            if src:
+                self.script_urls.append(src)
+        elif tag == 'link':
+            attrs = dict(attrs)
+            if attrs.get('href') and is_stylesheet(attrs.get('rel')):
+                self.stylesheet_urls.append(attrs['href'])
+        elif tag == 'base' and self.base_href is None:
+            self.base_href = dict(attrs).get('href') or None
+        elif tag == 'meta' and not self.meta_found:
+            attrs = dict(attrs)
+            if attrs.get('name') == 'description':
+                self.meta_found = True
+                self.meta_description = attrs.get('content')
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags have no body, so never enter code or hidden mode for them
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag == self._code_tag:
+            self._code_tag = None
+        elif self._hidden.get(tag):
+            self._hidden[tag] -= 1
+
+    def handle_data(self, data):
+        if self._code_tag == 'style':
+            self.css_size += len(data)
+        elif self._code_tag == 'script':
+            self.js_size += len(data)
+        elif not any(self._hidden.values()):
+            self._text.append(data)
+
+    def _flush_text(self):
+        # Tokenize one text node at a time; bi-grams continue across nodes
+        if not self._text:
+            return
+        tokens = self.tokenize("".join(self._text))
+        self._text = []
+        if not tokens:
+            return
+        if self._last_token is not None:
+            self.bi_gram_counts[(self._last_token, tokens[0])] += 1
+        self.bi_gram_counts.update(zip(tokens, tokens[1:]))
+        self._last_token = tokens[-1]
+
+    def close(self):
+        super().close()
+        self._flush_text()
+
+    def snapshot(self, bytes_received=0, done=False):
+        return PartialAnalysis(
+            bytes_received=bytes_received,
+            html_size=self.chars - self.css_size - self.js_size,
+            css_size=self.css_size,
+            js_size=self.js_size,
+            header_counts=dict(self.header_counts),
+            links=list(self.links),
+            meta_description=self.meta_description,
+            stylesheet_urls=list(self.stylesheet_urls),
+            script_urls=list(self.script_urls),
+            nofollow_links=list(self.nofollow_links),
+            base_href=self.base_href,
+            top_bi_grams=self.bi_gram_counts.most_common(10),
+            done=done,
+        )
+
+
+def analyze_stream(url, on_progress=None, progress_every=PROGRESS_EVERY, tokenize=None,
+                   max_bytes=http_client.MAX_BODY_BYTES):
+    """Download ``url`` and analyze it chunk by chunk.
+
+    ``on_progress`` is called with a ``PartialAnalysis`` roughly every
+    ``progress_every`` bytes. Returns the final ``PartialAnalysis`` and the
+    HTTP status code; raises ``requests.RequestException`` on fetch errors.
+    """
+    analyzer = StreamingAnalyzer(tokenize)
+    received = 0
+    next_report = progress_every
+    with http_client.open_stream(url) as response:
+        if response.status_code != 200:
+            return None, response.status_code
+        content_type = response.headers.get('Content-Type')
+        # The encoding is resolved from the first META_SCAN_BYTES, where a <meta charset> must be
+        head = b''
+        decoder = None
+        for chunk in http_client.iter_body(response, max_bytes):
+            received += len(chunk)
+            if decoder is None:
+                head += chunk
+                if len(head) < META_SCAN_BYTES:
+                    continue
+                decoder, text = _start_decoding(head, content_type)
+                head = None
+            else:
+                text = decoder.decode(chunk)
+            analyzer.feed(text)
+            if on_progress is not None and received >= next_report:
+                next_report = received + progress_every
+                on_progress(analyzer.snapshot(received))
+        if decoder is None:
+            # The whole page is shorter than META_SCAN_BYTES
+            decoder, text = _start_decoding(head, content_type)
+            analyzer.feed(text)
+        analyzer.feed(decoder.decode(b'', final=True))
+    analyzer.close()
+    return analyzer.snapshot(received, done=True), response.status_code
+
+
+def _start_decoding(head, content_type):
+    """Resolve the encoding from the first bytes; returns the incremental decoder and their text."""
+    encoding = resolve_encoding(head, content_type)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    return decoder, decoder.decode(strip_bom(head, encoding))
@@ -0,0 +1,81 @@
+"""Edge-case documents that every installed parser backend must read alike."""
+import pytest
+
+from extract import available_backends, conformance, extract_facts
+
+DOCUMENTS = {
+    'template': '<body><template><h1>Hidden</h1><a href="/t">t</a></template><h2>Shown</h2></body>',
+    'iframe': '<body><iframe><a href="/fallback">fallback</a></iframe><p>Shown</p></body>',
+    'noscript': '<body><noscript><a href="/n">n</a><h3>Counted</h3>not shown</noscript><p>Shown</p></body>',
+    'cdata': '<body><p>before <![CDATA[a comment in HTML]]> after</p></body>',
+    'cdata in svg': '<body><svg><text><![CDATA[svg text]]></text></svg><math><mi><![CDATA[x]]></mi></math></body>',
+    'content after </html>': '<html><body><p>inside</p></body></html><p>after</p><a href="/late">late</a>',
+    'end tags in raw text': '<html><head><script>var x = "</body>";</script><style>/* </html> */</style>'
+                            '<script type="application/ld+json">{"x":"</html>"}</script></head>'
+                            '<body><!-- </body> --><p>shown</p></body></html><p>after</p>',
+    'script and style': '<head><style>p{}</style><script src="/a.js">var a</script></head><body>text</body>',
+    'nofollow and base': '<head><base href="/docs/"></head><body><a href="x" rel="ugc nofollow">x</a>'
+                         '<a href="y">y</a></body>',
+    'empty': '',
+    'unclosed': '<p>one<li>two<h1>three',
+}
+
+# Text with characters outside ASCII, read back from bytes in each encoding
+LEGACY_TEXT = ('<head><meta name="description" content="{word}"></head>'
+               '<body><h1>{word}</h1><a href="/{word}">{word}</a></body>')
+LEGACY_WORDS = {
+    'cp1252': 'Café – naïve',
+    'iso8859-2': 'Zażółć gęślą',
+    'shift_jis': '日本語のページ',
+    'euc-kr': '한국어 페이지',
+    'koi8-r': 'Русский текст',
+}
+
+
+@pytest.mark.parametrize('name', sorted(DOCUMENTS))
+def test_backends_agree(name):
+    assert conformance(DOCUMENTS[name]) == {}
+
+
+@pytest.mark.parametrize('name', sorted(DOCUMENTS))
+def test_utf8_bytes_read_like_text(name):
+    html = DOCUMENTS[name]
+    assert conformance(html.encode('utf-8'), encoding='utf-8') == {}
+    for backend in available_backends():
+        assert extract_facts(html.encode('utf-8'), backend, 'utf-8') == extract_facts(html, backend)
+
+
+@pytest.mark.parametrize('encoding', sorted(LEGACY_WORDS))
+def test_legacy_encodings(encoding):
+    word = LEGACY_WORDS[encoding]
+    body = LEGACY_TEXT.format(word=word).encode(encoding)
+    assert conformance(body, encoding=encoding) == {}
+    facts = extract_facts(body, 'html.parser', encoding)
+    assert facts.text == f'{word} {word}'
+    assert facts.meta_description == word
+    assert facts.links == ['/' + word]
+
+
+def test_hidden_subtrees():
+    facts = extract_facts(DOCUMENTS['noscript'], 'html.parser')
+    # <noscript> text is not rendered but its links and headers count
+    assert facts.text == 'Shown'
+    assert facts.links == ['/n']
+    assert facts.header_counts == {'h3': 1}
+    facts = extract_facts(DOCUMENTS['template'], 'html.parser')
+    # Inert subtrees count for nothing
+    assert facts.links == []
+    assert facts.header_counts == {'h2': 1}
+
+
+def test_end_tags_inside_scripts_are_kept():
+    for backend in available_backends():
+        facts = extract_facts(DOCUMENTS['end tags in raw text'], backend)
+        assert facts.js_code == 'var x = "</body>";\n{"x":"</html>"}'
+        assert facts.css_code == '/* </html> */'
+        assert facts.text == 'shown after'
+
+
+def test_cdata_is_text_only_in_foreign_content():
+    assert extract_facts(DOCUMENTS['cdata'], 'html.parser').text == 'before after'
+    assert extract_facts(DOCUMENTS['cdata in svg'], 'html.parser').text == 'svg text x'
@@ -0,0 +1,47 @@
+"""Which encoding a fetched page is read with (charset.resolve)."""
+import codecs
+
+from charset import DETECT_SAMPLE_BYTES, META_SCAN_BYTES, decode, resolve
+
+META_LATIN1 = b'<html><head><meta charset="iso-8859-1"></head><body>caf\xe9</body></html>'
+
+
+def test_bom_beats_header_and_meta():
+    body = codecs.BOM_UTF8 + META_LATIN1
+    assert resolve(body, 'text/html; charset=shift_jis') == ('utf-8', 'bom')
+    assert resolve(codecs.BOM_UTF16_LE + 'hi'.encode('utf-16-le'), 'text/html; charset=utf-8') == ('utf-16-le', 'bom')
+
+
+def test_header_beats_meta():
+    assert resolve(META_LATIN1, 'text/html; charset="UTF-8"') == ('utf-8', 'header')
+
+
+def test_meta_beats_detection():
+    assert resolve(META_LATIN1, 'text/html') == ('cp1252', 'meta')
+    assert resolve(b'<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">', None) == ('koi8-r', 'meta')
+
+
+def test_meta_is_only_read_near_the_start():
+    body = b' ' * META_SCAN_BYTES + b'<meta charset="koi8-r">'
+    assert resolve(body) == ('utf-8', 'detected')
+
+
+def test_unknown_labels_fall_through():
+    assert resolve(META_LATIN1, 'text/html; charset=no-such-charset') == ('cp1252', 'meta')
+    assert resolve(b'<meta charset="no-such-charset">caf\xc3\xa9') == ('utf-8', 'detected')
+
+
+def test_detection_accepts_utf8_cut_at_the_sample_boundary():
+    body = b'a' * (DETECT_SAMPLE_BYTES - 1) + 'é'.encode('utf-8')
+    assert resolve(body) == ('utf-8', 'detected')
+
+
+def test_windows_1252_labels():
+    for label in ('ascii', 'us-ascii', 'latin-1', 'ISO-8859-1', 'l1', 'windows-1252'):
+        assert resolve(b'', f'text/html; charset={label}') == ('cp1252', 'header'), label
+    # Bytes that are undefined in ISO-8859-1 but typographic quotes in windows-1252
+    assert decode(b'\x93quoted\x94', resolve(b'', 'text/html; charset=iso-8859-1')[0]) == '“quoted”'
+
+
+def test_utf16_meta_means_utf8():
+    assert resolve(b'<meta charset="utf-16">', None) == ('utf-8', 'meta')
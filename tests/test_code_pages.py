@@ -0,0 +1,58 @@
+"""Paging and search in the code viewer (code_pages.CodePages, code_pages.LinePages)."""
+import pytest
+
+from code_pages import CodePages, LinePages
+
+LINES = [f"line {number}" for number in range(1, 251)]
+
+
+@pytest.fixture(params=['text', 'trailing newline', 'list'])
+def pages(request):
+    if request.param == 'list':
+        return LinePages(LINES)
+    return CodePages("\n".join(LINES) + ("\n" if request.param == 'trailing newline' else ""))
+
+
+def test_line_count(pages):
+    assert pages.line_count == 250
+
+
+def test_pages_end_at_their_boundary(pages):
+    assert pages.lines(1, 100) == "\n".join(LINES[:100])
+    assert pages.lines(101, 100) == "\n".join(LINES[100:200])
+    # The last page is short and has no trailing newline
+    assert pages.lines(201, 100) == "\n".join(LINES[200:])
+    assert pages.lines(250, 100) == "line 250"
+
+
+def test_out_of_range_pages_are_clamped(pages):
+    assert pages.lines(0, 2) == "line 1\nline 2"
+    assert pages.lines(400, 100) == "line 250"
+
+
+def test_search_reports_each_line_once(pages):
+    assert pages.search("line 10") == [10] + list(range(100, 110))
+    assert pages.search("LINE 250") == [250]
+    assert pages.search("LINE 250", case_sensitive=True) == []
+    assert pages.search("line", limit=3) == [1, 2, 3]
+    assert pages.search("") == []
+
+
+def test_hits_on_page_boundaries(pages):
+    assert pages.search("line 100") == [100]
+    assert pages.search("line 101") == [101]
+    assert pages.search("line 1", limit=200)[-1] == 199
+
+
+def test_empty_text():
+    pages = CodePages("")
+    assert pages.line_count == 0
+    assert pages.lines(1, 100) == ""
+    assert pages.search("x") == []
+
+
+def test_line_of_offsets():
+    pages = CodePages("ab\ncd\n\nef")
+    assert [pages.line_of(offset) for offset in (0, 2, 3, 6, 7, 8)] == [1, 1, 2, 3, 4, 4]
+    assert pages.lines(3, 1) == ""
+    assert pages.search("ef") == [4]
@@ -0,0 +1,33 @@
+"""Which links a crawl follows (crawl.site_of, crawl._extend_frontier)."""
+from collections import deque
+
+import crawl
+from crawl import VisitedSet, _extend_frontier, site_of
+
+
+def test_site_includes_a_non_default_port():
+    assert site_of('http://www.Example.com/') == site_of('http://example.com:80/a') == 'example.com'
+    assert site_of('https://example.com:443/') == 'example.com'
+    assert site_of('http://example.com:8080/') == 'example.com:8080'
+    assert site_of('http://example.com:8080/') != site_of('http://example.com:8081/')
+
+
+def test_links_to_other_ports_are_not_followed():
+    frontier, visited = deque(), VisitedSet()
+    hrefs = ['/a', 'http://localhost:8081/b', 'http://localhost/c', 'http://www.localhost:8080/d']
+    _extend_frontier(frontier, visited, site_of('http://localhost:8080/'), 'http://localhost:8080/', hrefs, 1)
+    assert [url for url, _ in frontier] == ['http://localhost:8080/a', 'http://www.localhost:8080/d']
+
+
+def test_links_over_the_frontier_cap_are_not_marked_visited(monkeypatch):
+    monkeypatch.setattr(crawl, 'MAX_FRONTIER', 1)
+    frontier, visited = deque(), VisitedSet()
+    site = site_of('http://example.com/')
+    assert _extend_frontier(frontier, visited, site, 'http://example.com/', ['/a', '/b', '/a'], 1) == 1
+    assert [url for url, _ in frontier] == ['http://example.com/a']
+    assert 'http://example.com/b' not in visited
+
+    # Once there is room, a later page linking to the dropped URL queues it
+    frontier.clear()
+    assert _extend_frontier(frontier, visited, site, 'http://example.com/', ['/a', '/b'], 2) == 0
+    assert list(frontier) == [('http://example.com/b', 2)]
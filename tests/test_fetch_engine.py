@@ -0,0 +1,59 @@
+"""Status retries and error mapping of the shared fetch engine."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import fetch_engine
+
+
+class _Flaky(BaseHTTPRequestHandler):
+    """Answers 503 to the first request for each path (every request for /down), then 200."""
+
+    seen = {}
+
+    def do_GET(self):
+        attempt = self.seen[self.path] = self.seen.get(self.path, 0) + 1
+        status = 503 if attempt == 1 or self.path == '/down' else 200
+        body = f"attempt {attempt}".encode('ascii')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Flaky)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(fetch_engine, 'RETRY_BACKOFF', 0.01)
+    engine = fetch_engine.FetchEngine()
+    yield engine
+    engine.close()
+
+
+def test_retries_server_errors(engine, base_url):
+    response = engine.fetch(base_url + '/flaky')
+    assert (response.status_code, response.content) == (200, b'attempt 2')
+    assert engine.stats['retries'] == 1
+
+
+def test_gives_up_after_the_retries(engine, base_url):
+    response = engine.fetch(base_url + '/down')
+    assert (response.status_code, response.content) == (503, f'attempt {fetch_engine.RETRIES + 1}'.encode())
+
+
+@pytest.mark.parametrize('url', ['http://localhost:99999/', 'http://a..b/', 'http://localhost/\x00'])
+def test_malformed_urls_raise_request_exceptions(engine, url):
+    with pytest.raises(requests.RequestException):
+        engine.fetch(url)
@@ -0,0 +1,41 @@
+"""Which page changes re-run the analysis (fingerprint.py, analysis.analyze_page)."""
+from analysis import analyze_page
+from fingerprint import normalized_hash
+
+PAGE = ('<html><head><meta name="csrf-token" content="{token}"><script nonce="{token}">var a = 1;</script></head>'
+        '<body><!-- generated {generated} --><form><input type="hidden" name="csrf_token" value="{token}"></form>'
+        '<h1>Orders</h1><a href="/order/{order}">Order {order}</a> <a href="/commit/{commit}">commit</a>'
+        '<p>Updated {date}</p></body></html>')
+ORIGINAL = dict(token='r4nd0m', generated='0.12s', order='1234567890', commit='a' * 40, date='2024-05-01T10:00:00Z')
+
+
+def page(**changes):
+    return PAGE.format(**dict(ORIGINAL, **changes)).encode('utf-8')
+
+
+def test_only_volatile_markup_differs():
+    assert normalized_hash(page()) == normalized_hash(page(token='0th3r', generated='0.34s'))
+
+
+def test_changed_content_is_not_normalized_away():
+    original = normalized_hash(page())
+    assert normalized_hash(page(order='1999999999')) != original
+    assert normalized_hash(page(commit='b' * 40)) != original
+    assert normalized_hash(page(date='2024-06-01T10:00:00Z')) != original
+
+
+def test_analyze_page_reuses_only_unchanged_pages():
+    url = 'http://fingerprint.test/'
+    first = analyze_page(url, page(), 'utf-8')
+    assert not first.unchanged
+
+    nonce_only = analyze_page(url, page(token='n3w'), 'utf-8')
+    assert nonce_only.unchanged
+    assert nonce_only.facts.links == first.facts.links
+    # The source shown is this response's, not the memoized one
+    assert 'n3w' in nonce_only.html_code
+    assert nonce_only.content_hash != first.content_hash
+
+    changed = analyze_page(url, page(order='1999999999'), 'utf-8')
+    assert not changed.unchanged
+    assert '/order/1999999999' in changed.facts.links
@@ -0,0 +1,29 @@
+"""The cold-start import budget of secode.py (see check_imports.py)."""
+import ast
+import os
+
+import check_imports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _top_level_local_imports():
+    with open(os.path.join(ROOT, 'secode.py'), encoding='utf-8') as script:
+        tree = ast.parse(script.read())
+    names = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module.split('.')[0])
+    return {name for name in names if os.path.exists(os.path.join(ROOT, name + '.py'))}
+
+
+def test_startup_modules_cover_secode_imports():
+    assert _top_level_local_imports() <= set(check_imports.STARTUP_MODULES)
+
+
+def test_startup_imports_within_budget():
+    total_ms, imported = check_imports.measure()
+    assert check_imports.leaked_dependencies(imported) == []
+    assert total_ms <= check_imports.BUDGET_MS
@@ -0,0 +1,46 @@
+"""How the links of a page are resolved and classified (crawl.canonicalize, links.build_link_index)."""
+from crawl import canonicalize
+from extract import PageFacts
+from links import build_link_index
+
+
+def test_canonicalize():
+    assert canonicalize('HTTP://WWW.Example.COM:80') == 'http://www.example.com/'
+    assert canonicalize('https://example.com:443/a/./b/../c/?b=2&utm_source=x&a=1#part') == 'https://example.com/a/c/?a=1&b=2'
+    assert canonicalize('http://example.com:8080/a/..') == 'http://example.com:8080/'
+    assert canonicalize('mailto:someone@example.com') is None
+    assert canonicalize('/relative') is None
+
+
+def index(page_url, links, base_href=None, nofollow=()):
+    facts = PageFacts(links=links, base_href=base_href, nofollow_links=list(nofollow))
+    return {link.url: link for link in build_link_index(page_url, facts)}
+
+
+def test_links_resolve_against_the_base_href():
+    links = index('https://example.com/blog/post.html',
+                  ['next.html', '/root', '//cdn.example.net/x', '#top', '?page=2', 'mailto:a@b.c', ' javascript:void(0)'],
+                  base_href='/docs/v2/')
+    assert list(links) == [
+        'https://example.com/docs/v2/next.html',
+        'https://example.com/root',
+        'https://cdn.example.net/x',
+        'https://example.com/docs/v2/',
+        'https://example.com/docs/v2/?page=2',
+    ]
+    assert [link.internal for link in links.values()] == [True, True, False, True, True]
+
+
+def test_relative_base_href_and_other_hosts():
+    links = index('http://www.example.com/a/b/page', ['c', 'http://example.com/d', 'http://example.com:8080/e'],
+                  base_href='../other/')
+    assert list(links) == ['http://www.example.com/a/other/c', 'http://example.com/d', 'http://example.com:8080/e']
+    assert [link.internal for link in links.values()] == [True, True, False]
+
+
+def test_duplicates_are_counted_and_nofollow_needs_every_occurrence():
+    links = index('https://example.com/', ['/a', '/a#x', '/b', '/b'], nofollow=['/a', '/b'])
+    assert links['https://example.com/a'].count == 2
+    assert links['https://example.com/a'].href == '/a'
+    assert not links['https://example.com/a'].nofollow
+    assert links['https://example.com/b'].nofollow
@@ -0,0 +1,51 @@
+"""The n-gram engine against nltk's tokenizer and counting on a fixture corpus.
+
+The corpus has one sentence per line, so ``word_tokenize(preserve_line=True)``
+tokenizes it as nltk does with the punkt sentence splitter (not installed
+here). Known difference: a period ending an abbreviation inside a sentence
+(``U.S. law``) is split off here and kept by punkt.
+"""
+import os
+from collections import Counter
+
+import pytest
+
+from ngrams import STOPWORDS, tokenize, top_ngrams
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'fixtures', 'corpus.txt')
+
+
+@pytest.fixture(scope='module')
+def sentences():
+    with open(CORPUS, encoding='utf-8') as corpus:
+        return corpus.read().splitlines()
+
+
+@pytest.fixture(scope='module')
+def nltk_tokens(sentences):
+    nltk = pytest.importorskip('nltk')
+    return [token for sentence in sentences for token in nltk.word_tokenize(sentence, preserve_line=True)]
+
+
+def test_tokens_match_nltk(sentences, nltk_tokens):
+    assert tokenize(" ".join(sentences)) == nltk_tokens
+
+
+@pytest.mark.parametrize('n', [1, 2, 3])
+def test_top_10_matches_nltk(sentences, nltk_tokens, n):
+    from nltk import ngrams
+
+    assert top_ngrams(" ".join(sentences), n=n, k=10) == Counter(ngrams(nltk_tokens, n)).most_common(10)
+
+
+def test_stopwords(sentences):
+    top = top_ngrams(" ".join(sentences), n=2, k=5, stopwords=STOPWORDS)
+    assert top[:3] == [(('lazy', 'dog'), 7), (('quick', 'brown'), 6), (('brown', 'fox'), 6)]
+    assert all(word.lower() not in STOPWORDS for gram, _ in top for word in gram)
+
+
+def test_short_text():
+    assert top_ngrams("one", n=2) == []
+    assert top_ngrams("", n=1) == []
+    with pytest.raises(ValueError):
+        top_ngrams("a b c d", n=4)
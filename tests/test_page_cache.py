@@ -0,0 +1,34 @@
+"""How long a fetched page is served from the cache (page_cache.freshness_lifetime)."""
+from page_cache import DEFAULT_TTL, freshness_lifetime
+
+
+def lifetime(cache_control):
+    return freshness_lifetime({'Cache-Control': cache_control} if cache_control is not None else {})
+
+
+def test_max_age():
+    assert lifetime('public, max-age=300') == 300
+    assert lifetime('MAX-AGE="45"') == 45
+    assert lifetime('max-age=0') == 0
+
+
+def test_s_maxage_wins_over_max_age():
+    assert lifetime('max-age=60, s-maxage=600') == 600
+
+
+def test_pages_that_must_not_be_stored():
+    assert lifetime('no-store') is None
+    assert lifetime('private, max-age=300') is None
+
+
+def test_no_cache_means_revalidate_every_time():
+    assert lifetime('no-cache, max-age=300') == 0
+
+
+def test_missing_or_unreadable_max_age_uses_the_default():
+    assert lifetime(None) == DEFAULT_TTL
+    assert lifetime('') == DEFAULT_TTL
+    assert lifetime('public') == DEFAULT_TTL
+    assert lifetime('max-age=-1') == DEFAULT_TTL
+    assert lifetime('max-age=soon') == DEFAULT_TTL
+    assert freshness_lifetime({}, default_ttl=5) == 5
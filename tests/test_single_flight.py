@@ -0,0 +1,90 @@
+"""Sharing one analysis between concurrent callers (analysis._single_flight)."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import analysis
+from analysis import _single_flight, analyze_html
+
+
+class Stop(BaseException):
+    """Stands in for Streamlit's StopException/RerunException."""
+
+
+def _page():
+    return analyze_html('http://flight.test/', '<a href="/a">a</a><a href="/b">b</a>')
+
+
+def _join_second(pool, key, work, first_progress=None, second_progress=None):
+    """Start a leader and a caller that joins its flight; returns both futures."""
+    coalesced = analysis.flight_stats['coalesced']
+    first = pool.submit(_single_flight, key, work, first_progress)
+    while key not in analysis._flights:
+        time.sleep(0.001)
+    second = pool.submit(_single_flight, key, work, second_progress)
+    while analysis.flight_stats['coalesced'] == coalesced:
+        time.sleep(0.001)
+    return first, second
+
+
+def test_waiters_get_their_own_links():
+    release = threading.Event()
+
+    def work(publish):
+        release.wait(5)
+        return _page()
+
+    with ThreadPoolExecutor(2) as pool:
+        leader, waiter = _join_second(pool, 'links', work)
+        release.set()
+        leader, waiter = leader.result(5), waiter.result(5)
+    assert waiter.coalesced and not leader.coalesced
+    waiter.link_index[0].status = 404
+    assert leader.link_index[0].status is None
+
+
+def test_progress_callbacks_run_in_each_callers_thread():
+    go, stopped, recorded = threading.Event(), threading.Event(), threading.Event()
+    seen = []
+
+    def work(publish):
+        go.wait(5)
+        publish('half')
+        # A finished flight skips progress not yet handed on, so let both callers see it first
+        stopped.wait(5)
+        recorded.wait(5)
+        return _page()
+
+    def stop(partial):
+        stopped.set()
+        raise Stop()
+
+    def record(partial):
+        seen.append((partial, threading.current_thread()))
+        recorded.set()
+
+    with ThreadPoolExecutor(2) as pool:
+        leader, waiter = _join_second(pool, 'progress', work, stop, record)
+        go.set()
+        # The leader's session stops; the work goes on for the other caller
+        with pytest.raises(Stop):
+            leader.result(5)
+        assert waiter.result(5).coalesced
+    assert [partial for partial, _ in seen] == ['half']
+    assert seen[0][1].name != 'secode-analysis'
+
+
+def test_base_exception_is_not_shared():
+    calls = []
+
+    def work(publish):
+        calls.append(publish)
+        if len(calls) == 1:
+            raise Stop()
+        return 'own result'
+
+    assert _single_flight('aborted', work) == 'own result'
+    assert len(calls) == 2
+    assert 'aborted' not in analysis._flights